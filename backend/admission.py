@@ -0,0 +1,197 @@
+# backend/admission.py
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from tracing import ADMISSIONS, ADMISSION_WAIT
+
+# Priority classes, most urgent first
+PRIORITIES = ("interactive", "batch")
+
+
+class Overloaded(Exception):
+    """The request was refused or shed: 429 when the wait queue was full, 503 when it waited too long or was
+    displaced by a more urgent request. ``retry_after`` estimates the seconds until a slot is likely free."""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight limit with a bounded, prioritized wait queue in front of it.
+
+    At most ``max_inflight`` requests run at once. Others wait, and a freed slot goes to the most urgent
+    class first, oldest first within a class. Once a class has ``max_queued[priority]`` waiters, a further
+    request of that class takes the place of the newest waiter of a less urgent class, or is refused at once
+    if there is none. A class can so exceed its own limit by the waiters it displaced, but the total number
+    of waiters never exceeds the sum of the limits. A waiter gives up after ``max_wait_seconds[priority]``.
+    Use ``None`` for no limit.
+    """
+
+    def __init__(self, max_inflight: int = 16, max_queued: Optional[Dict[str, Optional[int]]] = None,
+                 max_wait_seconds: Optional[Dict[str, Optional[float]]] = None):
+        self.max_inflight = max_inflight
+        self.max_queued = {priority: None for priority in PRIORITIES} | (max_queued or {})
+        self.max_wait_seconds = {priority: None for priority in PRIORITIES} | (max_wait_seconds or {})
+        self.inflight = 0
+        self._waiters = []  # heap of (rank, sequence, priority, future)
+        self._queued = {priority: 0 for priority in PRIORITIES}
+        self._sequence = itertools.count()
+        self._service_seconds = None  # Moving average of how long a request holds its slot
+        self.stats = {
+            priority: {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "shed": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+            for priority in PRIORITIES
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained."""
+        service = self._service_seconds or 1.0
+        return max(1, min(60, math.ceil(service * (len(self._waiters) + 1) / self.max_inflight)))
+
+    def _refuse(self, priority: str, event: str, message: str, status_code: int) -> Overloaded:
+        self.stats[priority][event] += 1
+        ADMISSIONS.inc(priority=priority, outcome=event)
+        return Overloaded(message, status_code, self.retry_after())
+
+    def _shed_for(self, priority: str) -> bool:
+        """Reject the newest waiter of the least urgent class below ``priority``, if any, so a ``priority`` request can queue in its place."""
+        rank = PRIORITIES.index(priority)
+        victims = [waiter for waiter in self._waiters if waiter[0] > rank and not waiter[3].done()]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda waiter: (waiter[0], waiter[1]))
+        victim[3].set_exception(self._refuse(victim[2], "shed", "Shed to make room for more urgent requests", 503))
+        return True
+
+    async def acquire(self, priority: str = "interactive"):
+        """Wait for a slot. Raises ``Overloaded`` when refused or shed; call ``release()`` after a successful acquire."""
+        started = time.perf_counter()
+        if self.inflight < self.max_inflight and not self._waiters:
+            self.inflight += 1
+        else:
+            limit = self.max_queued[priority]
+            if limit is not None and self._queued[priority] >= limit and not self._shed_for(priority):
+                raise self._refuse(priority, "rejected", "Too many requests are waiting; retry later", 429)
+            future = asyncio.get_running_loop().create_future()
+            waiter = (PRIORITIES.index(priority), next(self._sequence), priority, future)
+            heapq.heappush(self._waiters, waiter)
+            self._queued[priority] += 1
+            self.stats[priority]["queued"] += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(future), self.max_wait_seconds[priority])
+            except asyncio.TimeoutError:
+                if not (future.done() and not future.cancelled() and future.exception() is None):
+                    future.cancel()
+                    raise self._refuse(priority, "timed_out", "No capacity became free in time; retry later", 503)
+                # Otherwise the slot was handed over just as the wait ran out; keep it
+            except BaseException:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    # Cancelled after the slot was handed over - pass it on
+                    self.release()
+                future.cancel()
+                raise
+            finally:
+                self._waiters = [w for w in self._waiters if w is not waiter]
+                heapq.heapify(self._waiters)
+                self._queued[priority] -= 1
+        waited = time.perf_counter() - started
+        stats = self.stats[priority]
+        stats["admitted"] += 1
+        stats["wait_seconds"] += waited
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+        ADMISSIONS.inc(priority=priority, outcome="admitted")
+        ADMISSION_WAIT.observe(waited, priority=priority)
+
+    def release(self, held_seconds: Optional[float] = None):
+        """Free a slot and hand it to the most urgent waiter."""
+        if held_seconds is not None:
+            self._service_seconds = held_seconds if self._service_seconds is None else 0.8 * self._service_seconds + 0.2 * held_seconds
+        while self._waiters:
+            _, _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # The slot passes straight to the waiter
+                return
+        self.inflight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive"):
+        await self.acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def queue_depth(self) -> Dict[str, int]:
+        return dict(self._queued)
+
+    def get_stats(self) -> dict:
+        classes = {}
+        for priority, stats in self.stats.items():
+            admitted = stats["admitted"]
+            classes[priority] = {
+                **{key: value for key, value in stats.items() if key != "wait_seconds"},
+                "max_wait_seconds": round(stats["max_wait_seconds"], 3),
+                "avg_wait_seconds": round(stats["wait_seconds"] / admitted, 4) if admitted else None,
+                "queue_depth": self._queued[priority],
+                "max_queued": self.max_queued[priority],
+                "max_wait_limit_seconds": self.max_wait_seconds[priority],
+            }
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "avg_service_seconds": round(self._service_seconds, 3) if self._service_seconds is not None else None,
+            "retry_after": self.retry_after(),
+            "classes": classes,
+        }
+
+
+def parse_api_key_priorities(value: str) -> Dict[str, str]:
+    """``key1:batch,key2:interactive`` -> {"key1": "batch", "key2": "interactive"}."""
+    priorities = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        key, _, priority = item.rpartition(":")
+        if not key or priority not in PRIORITIES:
+            raise ValueError(f"Invalid ADMISSION_API_KEYS entry '{item}'. Use key:interactive or key:batch.")
+        priorities[key] = priority
+    return priorities
+
+
+def resolve_priority(default: str, api_key: Optional[str] = None, requested: Optional[str] = None, api_keys: Optional[Dict[str, str]] = None) -> str:
+    """Priority class of a request: the class assigned to its API key, else the requested class if it is no
+    more urgent than the endpoint's ``default`` (clients may lower their own priority, not raise it), else ``default``."""
+    if api_key and api_keys and api_key in api_keys:
+        return api_keys[api_key]
+    if requested in PRIORITIES and PRIORITIES.index(requested) >= PRIORITIES.index(default):
+        return requested
+    return default
+
+
+def _optional(name: str, default: str, kind=float):
+    value = os.environ.get(name, default)
+    return kind(value) if value else None
+
+
+def build_admission(max_inflight: int) -> AdmissionController:
+    """Create an admission controller for ``max_inflight`` workflows with the queues described by the ADMISSION_* environment variables."""
+    return AdmissionController(
+        max_inflight=max_inflight,
+        max_queued={
+            "interactive": _optional("ADMISSION_QUEUE_INTERACTIVE", "32", int),
+            "batch": _optional("ADMISSION_QUEUE_BATCH", "64", int),
+        },
+        max_wait_seconds={
+            "interactive": _optional("ADMISSION_WAIT_INTERACTIVE_SECONDS", "10"),
+            "batch": _optional("ADMISSION_WAIT_BATCH_SECONDS", "120"),
+        },
+    )
+
+
+# API keys (sent as X-API-Key) with a fixed priority class, e.g. "frontend-key:interactive,etl-key:batch"
+ADMISSION_API_KEYS = parse_api_key_priorities(os.environ.get("ADMISSION_API_KEYS", ""))
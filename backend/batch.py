@@ -0,0 +1,47 @@
+# backend/batch.py
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, List
+from cache import normalize_query
+from admission import Overloaded
+
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_QUERIES = int(os.environ.get("BATCH_MAX_QUERIES", "5000"))
+
+
+async def run_batch(queries: List[str], answer: Callable[[str], Awaitable[dict]], concurrency: int = BATCH_CONCURRENCY):
+    """Answer many queries with at most ``concurrency`` in flight and yield one item per query as it completes.
+
+    Queries that are identical after normalization are answered once, and every copy gets the
+    result. Items are yielded in completion order and carry their ``index`` in ``queries``.
+    """
+    groups = {}
+    for index, query in enumerate(queries):
+        groups.setdefault(normalize_query(query), []).append(index)
+    pool = asyncio.Semaphore(concurrency)
+
+    async def answer_group(indices):
+        async with pool:
+            started = time.perf_counter()
+            try:
+                result = await answer(queries[indices[0]])
+                outcome = {"status": "partial" if result.get("partial") else "success", "result": result}
+            except Overloaded as e:
+                # Refused or shed by admission control: the same status and Retry-After a single /process call gets
+                outcome = {"status": "error", "detail": str(e), "status_code": e.status_code, "retry_after": e.retry_after}
+            except Exception as e:
+                outcome = {"status": "error", "detail": str(e)}
+            outcome["seconds"] = round(time.perf_counter() - started, 3)
+        return indices, outcome
+
+    tasks = [asyncio.ensure_future(answer_group(indices)) for indices in groups.values()]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            indices, outcome = await completed
+            for index in indices:
+                yield {"type": "item", "index": index, "query": queries[index], "deduplicated": index != indices[0], **outcome}
+    finally:
+        # The client went away or the batch finished - stop any work still queued
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,121 @@
+# backend/budget.py
+import os
+import time
+import logging
+from typing import Optional
+from pydantic import BaseModel, Field
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger("brainchain")
+
+def _env_number(name, default, cast):
+    value = os.environ.get(name, default)
+    return cast(value) if value not in (None, "") else None
+
+# Define the per-request limits
+class Budget(BaseModel):
+    max_hops: Optional[int] = Field(default=None, ge=1, description="Maximum number of node visits (supervisor, workers and validator).")
+    max_llm_calls: Optional[int] = Field(default=None, ge=1, description="Maximum number of LLM calls, including those made inside the ReAct agents.")
+    max_tokens: Optional[int] = Field(default=None, ge=1, description="Maximum prompt plus completion tokens reported by the LLM.")
+    timeout_seconds: Optional[float] = Field(default=None, gt=0, description="Wall-clock deadline for the whole request.")
+
+# Server-wide defaults, overridable per request through QueryRequest.budget; set a variable to "" to disable that limit
+DEFAULT_BUDGET = Budget(
+    max_hops=_env_number("BUDGET_MAX_HOPS", "15", int),
+    max_llm_calls=_env_number("BUDGET_MAX_LLM_CALLS", "30", int),
+    max_tokens=_env_number("BUDGET_MAX_TOKENS", "100000", int),
+    timeout_seconds=_env_number("BUDGET_TIMEOUT_SECONDS", "120", float),
+)
+
+def resolve_budget(budget: Optional[Budget] = None) -> Budget:
+    """Fill the limits a request did not set with the server defaults."""
+    if budget is None:
+        return DEFAULT_BUDGET
+    return DEFAULT_BUDGET.model_copy(update=budget.model_dump(exclude_none=True))
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, limit: str, usage: dict):
+        self.limit = limit
+        self.usage = usage
+        super().__init__(f"Budget '{limit}' exhausted: {usage}")
+
+
+class BudgetTracker(BaseCallbackHandler):
+    """Counts hops, LLM calls and tokens for one request and stops the run once a limit is reached.
+
+    The tracker is attached to the run config as a callback, so it also sees the LLM calls made by
+    the ReAct agents. Limits are checked before each node and before each LLM call, never after a
+    call has already been paid for.
+    """
+
+    raise_error = True
+    run_inline = True
+
+    def __init__(self, budget: Optional[Budget] = None):
+        self.budget = resolve_budget(budget)
+        self.started = time.monotonic()
+        self.hops = 0
+        self.llm_calls = 0
+        self.tokens = 0
+
+    def config(self) -> dict:
+        """Run config that attaches this tracker to a workflow invocation."""
+        config = {"callbacks": [self], "configurable": {"budget": self}}
+        if self.budget.max_hops:
+            # Leave LangGraph's own recursion limit above ours so the budget is what stops the run
+            config["recursion_limit"] = max(25, self.budget.max_hops + 5)
+        return config
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.budget.timeout_seconds is None:
+            return None
+        return max(0.0, self.budget.timeout_seconds - self.elapsed())
+
+    def usage(self) -> dict:
+        return {
+            "hops": self.hops,
+            "llm_calls": self.llm_calls,
+            "tokens": self.tokens,
+            "elapsed_seconds": round(self.elapsed(), 3),
+        }
+
+    def check(self):
+        budget = self.budget
+        if budget.max_hops is not None and self.hops > budget.max_hops:
+            raise BudgetExceeded("max_hops", self.usage())
+        if budget.max_llm_calls is not None and self.llm_calls > budget.max_llm_calls:
+            raise BudgetExceeded("max_llm_calls", self.usage())
+        if budget.max_tokens is not None and self.tokens >= budget.max_tokens:
+            raise BudgetExceeded("max_tokens", self.usage())
+        if budget.timeout_seconds is not None and self.elapsed() >= budget.timeout_seconds:
+            raise BudgetExceeded("timeout_seconds", self.usage())
+
+    def count_hop(self):
+        self.hops += 1
+        self.check()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.llm_calls += 1
+        self.check()
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self.tokens += usage.get("total_tokens", 0)
+
+
+def count_hop(config) -> None:
+    """Record a node visit against the request budget, if the run has one."""
+    tracker = (config or {}).get("configurable", {}).get("budget")
+    if tracker is not None:
+        tracker.count_hop()
+
+
+def log_budget_stop(limit: str, tracker: BudgetTracker):
+    logger.warning("Budget exhausted: %s (limits=%s, usage=%s)", limit, tracker.budget.model_dump(), tracker.usage())
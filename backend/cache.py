@@ -0,0 +1,226 @@
+# backend/cache.py
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: case, surrounding punctuation and repeated whitespace do not matter."""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.strip(" ?!.")
+
+
+def cosine_similarity(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+# Storage backends - both evict the least recently used entry when full and drop entries older than the TTL
+class MemoryCacheBackend:
+    """In-process store. Fast, but every worker process has its own copy."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, entry)
+        self._lock = threading.Lock()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if self._expired(item[0]):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = (time.time(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def scan(self) -> Iterator[Tuple[str, dict]]:
+        with self._lock:
+            items = [(key, entry) for key, (stored_at, entry) in self._entries.items() if not self._expired(stored_at)]
+        return iter(items)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Autocommit connection in WAL mode, so several worker processes can read while one writes."""
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SQLiteCacheBackend:
+    """File-backed store that survives restarts and can be shared by processes on one host.
+
+    The connection is opened lazily in each process, so a backend created before a pre-fork
+    server forks its workers never shares a SQLite connection across processes.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl_seconds: Optional[float] = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn_pid = None
+        self._connection = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._conn_pid != os.getpid():
+            self._connection = connect_sqlite(self.path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, entry TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed_at)")
+            self._conn_pid = os.getpid()
+        return self._connection
+
+    def _cutoff(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds is not None else float("-inf")
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT entry FROM response_cache WHERE key = ? AND stored_at >= ?", (key, self._cutoff())
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE response_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+
+    def set(self, key: str, entry: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, entry, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry), now, now),
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE stored_at < ?", (self._cutoff(),))
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key NOT IN "
+                "(SELECT key FROM response_cache ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def scan(self) -> Iterator[Tuple[str, dict]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, entry FROM response_cache WHERE stored_at >= ?", (self._cutoff(),)
+            ).fetchall()
+        return ((key, json.loads(entry)) for key, entry in rows)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Two-tier cache for workflow responses.
+
+    The exact tier looks up the normalized query text. If an ``embeddings`` model (any LangChain
+    ``Embeddings``) is given, a miss falls through to the semantic tier, which returns the stored
+    response of the most similar previous query when the cosine similarity reaches ``similarity_threshold``.
+    Responses of different shapes for the same query are kept apart by a ``namespace``; lookups only
+    ever return a response stored in the same namespace.
+    """
+
+    def __init__(self, backend, embeddings=None, similarity_threshold: float = 0.92):
+        self.backend = backend
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+
+    def get(self, query: str, namespace: str = "") -> Optional[dict]:
+        text = normalize_query(query)
+        entry = self.backend.get(f"{namespace}:{text}" if namespace else text)
+        if entry is not None:
+            self.stats["exact_hits"] += 1
+            return entry["response"]
+        if self.embeddings is not None:
+            vector = self.embeddings.embed_query(text)
+            best_key, best_score = None, self.similarity_threshold
+            for other_key, other in self.backend.scan():
+                if other.get("namespace", "") != namespace:
+                    continue
+                score = cosine_similarity(vector, other.get("embedding") or [])
+                if score >= best_score:
+                    best_key, best_score = other_key, score
+            if best_key is not None:
+                entry = self.backend.get(best_key)
+                if entry is not None:
+                    self.stats["semantic_hits"] += 1
+                    return entry["response"]
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, query: str, response: dict, namespace: str = ""):
+        text = normalize_query(query)
+        entry = {"query": query, "response": response, "namespace": namespace}
+        if self.embeddings is not None:
+            entry["embedding"] = self.embeddings.embed_query(text)
+        self.backend.set(f"{namespace}:{text}" if namespace else text, entry)
+        self.stats["stores"] += 1
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.backend),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """Create the response cache described by the RESPONSE_CACHE_* environment variables, or None if disabled."""
+    kind = os.environ.get("RESPONSE_CACHE", "memory").lower()
+    if kind in ("", "off", "none"):
+        return None
+    max_entries = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+    ttl = os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "3600")
+    ttl_seconds = float(ttl) if ttl else None
+    if kind == "sqlite":
+        path = os.environ.get("RESPONSE_CACHE_PATH", "response_cache.db")
+        backend = SQLiteCacheBackend(path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+    elif kind == "memory":
+        backend = MemoryCacheBackend(max_entries=max_entries, ttl_seconds=ttl_seconds)
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE backend '{kind}'. Use 'memory', 'sqlite' or 'off'.")
+
+    embeddings = None
+    model_name = os.environ.get("RESPONSE_CACHE_EMBEDDING_MODEL")
+    if model_name:
+        # The semantic tier is optional and needs the fastembed package
+        from langchain_community.embeddings import FastEmbedEmbeddings
+        embeddings = FastEmbedEmbeddings(model_name=model_name)
+    threshold = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0.92"))
+    return ResponseCache(backend, embeddings=embeddings, similarity_threshold=threshold)
@@ -0,0 +1,168 @@
+# backend/compaction.py
+import os
+import logging
+from typing import Optional, Tuple
+from pydantic import BaseModel, Field
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+logger = logging.getLogger("brainchain")
+
+TRUNCATION_MARKER = " ...[truncated]"
+
+# Define how much of the transcript a node gets to see
+class CompactionPolicy(BaseModel):
+    keep_last: Optional[int] = Field(default=None, ge=0, description="Number of latest agent messages to keep after the original question. None keeps the whole transcript.")
+    keep_latest_from: Tuple[str, ...] = Field(default=("enhancer",), description="Agents whose most recent message is always kept, e.g. the enhanced query.")
+    summarize_older: bool = Field(default=False, description="Replace dropped messages with a one-line-per-message digest instead of discarding them.")
+    max_message_chars: Optional[int] = Field(default=None, ge=1, description="Truncate every kept message except the newest to this many characters.")
+    max_tool_chars: Optional[int] = Field(default=None, ge=1, description="Truncate tool outputs to this many characters.")
+
+# Per-node policies. The validator already sees only the question and the latest answer.
+COMPACTION_POLICIES = {
+    "supervisor": CompactionPolicy(keep_last=4, summarize_older=True, max_message_chars=1500),
+    "enhancer": CompactionPolicy(keep_last=0, keep_latest_from=()),
+    "researcher": CompactionPolicy(keep_last=2, max_message_chars=3000, max_tool_chars=4000),
+    "coder": CompactionPolicy(keep_last=2, max_message_chars=3000, max_tool_chars=4000),
+}
+
+COMPACTION_ENABLED = os.environ.get("CONTEXT_COMPACTION", "on").lower() not in ("off", "0", "false")
+
+# Running totals per node, reported by /compaction/stats
+stats = {}
+
+
+def _truncate(message, limit: Optional[int]):
+    if limit is None or not isinstance(message.content, str) or len(message.content) <= limit:
+        return message
+    return message.model_copy(update={"content": message.content[:limit] + TRUNCATION_MARKER})
+
+
+def _digest(messages, width: int = 160) -> HumanMessage:
+    lines = []
+    for message in messages:
+        text = " ".join(str(message.content).split())
+        lines.append(f"- {message.name or message.type}: {text[:width]}{'...' if len(text) > width else ''}")
+    return HumanMessage(content="Summary of earlier turns:\n" + "\n".join(lines), name="summary")
+
+
+# Workers whose output is the answer to the user's question
+ANSWER_NODES = ("researcher", "coder")
+
+
+def latest_worker_outputs(messages):
+    """Messages from the most recent worker round - one message, or one per branch after a fan-out."""
+    outputs = []
+    for message in reversed(messages):
+        name = getattr(message, "name", None)
+        if name in ANSWER_NODES:
+            outputs.append(message)
+        elif name == "supervisor" and outputs:
+            break
+    return list(reversed(outputs))
+
+
+def merge_worker_outputs(outputs) -> str:
+    """Join parallel branch outputs into the single answer the validator judges."""
+    if len(outputs) == 1:
+        return outputs[0].content
+    return "\n\n".join(f"{message.name.capitalize()}:\n{message.content}" for message in outputs)
+
+
+def best_answer(messages):
+    """Latest (merged) worker output in the transcript, or None if no worker has answered yet."""
+    outputs = latest_worker_outputs(messages)
+    return merge_worker_outputs(outputs) if outputs else None
+
+
+def split_turns(messages):
+    """Split a conversation thread into (earlier turns, current turn).
+
+    Agents always name their messages, so the current turn starts at the latest unnamed HumanMessage - the user's question.
+    """
+    start = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage) and messages[i].name is None), 0)
+    return list(messages[:start]), list(messages[start:])
+
+
+def conversation_digest(earlier, width: int = 600) -> HumanMessage:
+    """One question and final answer per earlier turn, so follow-ups keep their context without the agents' working."""
+    lines = []
+    turns = []
+    for message in earlier:
+        if isinstance(message, HumanMessage) and message.name is None:
+            turns.append([message])
+        elif turns:
+            turns[-1].append(message)
+    for turn in turns:
+        question = " ".join(str(turn[0].content).split())
+        answer = " ".join(str(best_answer(turn) or "(no answer)").split())
+        lines.append(f"- user: {question[:width]}{'...' if len(question) > width else ''}")
+        lines.append(f"  answer: {answer[:width]}{'...' if len(answer) > width else ''}")
+    return HumanMessage(content="Earlier in this conversation:\n" + "\n".join(lines), name="conversation")
+
+
+def compact_messages(messages, policy: CompactionPolicy):
+    """Return the slimmed-down graph transcript for ``policy``. The first message (the user's question) is always kept.
+
+    Older turns are digested extractively rather than by another LLM call, so compaction never adds a
+    round trip to the request it is trying to speed up.
+    """
+    if not messages:
+        return list(messages)
+    first, rest = messages[0], list(messages[1:])
+    if policy.keep_last is not None and len(rest) > policy.keep_last:
+        split = len(rest) - policy.keep_last
+        older, recent = rest[:split], rest[split:]
+        pinned = []
+        for name in policy.keep_latest_from:
+            latest = next((m for m in reversed(older) if m.name == name), None)
+            if latest is not None and not any(m.name == name for m in recent):
+                pinned.append(latest)
+        pinned.sort(key=older.index)
+        dropped = [m for m in older if not any(m is p for p in pinned)]
+        rest = ([_digest(dropped)] if policy.summarize_older and dropped else []) + pinned + recent
+    rest = [_truncate(m, policy.max_message_chars) for m in rest[:-1]] + rest[-1:]
+    return [first] + rest
+
+
+def compact_for_node(node: str, messages):
+    """Apply the node's policy and record the approximate token counts before and after.
+
+    Inside a ReAct agent the state ends with the agent's own tool calls and tool results. Those are
+    never dropped, since the model needs each tool result next to the call that produced it; only
+    the shared transcript before them is compacted, and tool outputs are truncated.
+
+    In a conversation thread, earlier turns collapse into one digest of questions and answers
+    placed before the current question, and the policy applies to the current turn only.
+    """
+    policy = COMPACTION_POLICIES.get(node)
+    if not COMPACTION_ENABLED or policy is None:
+        return list(messages)
+    # Every message the graph itself adds is a HumanMessage; the first other type starts the agent's own turn.
+    # Earlier turns of a thread are all HumanMessages too, so search from the current question onwards.
+    earlier, turn = split_turns(messages)
+    split = next((i for i, m in enumerate(turn) if not isinstance(m, HumanMessage)), len(turn))
+    transcript, own = turn[:split], turn[split:]
+    compacted = ([conversation_digest(earlier)] if earlier else []) + compact_messages(transcript, policy)
+    if policy.max_tool_chars is not None:
+        own = [_truncate(m, policy.max_tool_chars) if isinstance(m, ToolMessage) else m for m in own]
+    compacted += own
+    before = count_tokens_approximately(messages)
+    after = count_tokens_approximately(compacted)
+    totals = stats.setdefault(node, {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+    totals["calls"] += 1
+    totals["tokens_before"] += before
+    totals["tokens_after"] += after
+    if after < before:
+        logger.debug("compaction [%s]: %d -> %d tokens", node, before, after)
+    return compacted
+
+
+def compacting_prompt(node: str, system_prompt: str):
+    """ReAct ``state_modifier`` that prepends the system prompt to the compacted transcript.
+
+    It runs before every model turn inside the agent, so it also truncates the tool outputs the agent has collected.
+    """
+    def modifier(state):
+        return [SystemMessage(content=system_prompt)] + compact_for_node(node, state["messages"])
+    return modifier
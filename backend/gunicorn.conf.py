@@ -0,0 +1,23 @@
+# backend/gunicorn.conf.py
+# Multi-worker production mode: gunicorn manages WEB_CONCURRENCY uvicorn workers. With preloading the
+# application is imported and the workflow compiled once in the master, and the workers inherit it on fork.
+#
+#   gunicorn -c gunicorn.conf.py main:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("PRELOAD_APP", "on").lower() not in ("off", "0", "false")
+# Workflows can run for minutes; the budget deadline (BUDGET_TIMEOUT_SECONDS) stops them first
+timeout = int(os.environ.get("WORKER_TIMEOUT_SECONDS", "180"))
+graceful_timeout = int(os.environ.get("WORKER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+keepalive = 5
+
+
+def on_starting(server):
+    if preload_app:
+        # The app module is already imported; compile the graph and agents here so every worker starts with them
+        import workflow
+        seconds = workflow.init_workflow()
+        server.log.info("Workflow preloaded in %.1f ms", seconds * 1000)
@@ -0,0 +1,204 @@
+# backend/jobs.py
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Optional
+from cache import connect_sqlite
+
+logger = logging.getLogger("brainchain")
+
+JOB_QUEUE = os.environ.get("JOB_QUEUE", "sqlite").lower()
+JOB_QUEUE_PATH = os.environ.get("JOB_QUEUE_PATH", "jobs.db")
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "4"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "0.5"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "300"))
+JOB_RESULT_TTL_SECONDS = float(os.environ.get("JOB_RESULT_TTL_SECONDS", "86400"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_ADMISSION_RETRIES = int(os.environ.get("JOB_ADMISSION_RETRIES", "10"))
+
+
+class SQLiteJobQueue:
+    """Job queue in a SQLite file (WAL mode) shared by every worker process on the host.
+
+    Any worker can accept a job and any worker can report its status; whichever worker has a free
+    consumer claims it. The claiming worker renews its lease of ``lease_seconds`` while it works, so a job
+    is only claimed again once its worker died or hung; after ``max_attempts`` claims it is marked failed
+    instead. Only the worker holding the lease can finish a job. Finished jobs are kept for ``result_ttl_seconds``. Like the SQLite response cache, the
+    connection is opened lazily in each process so the queue can be created before a fork.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = JOB_LEASE_SECONDS, result_ttl_seconds: float = JOB_RESULT_TTL_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.result_ttl_seconds = result_ttl_seconds
+        self.worker_id = None
+        self._lock = threading.Lock()
+        self._conn_pid = None
+        self._connection = None
+
+    @property
+    def _conn(self):
+        if self._conn_pid != os.getpid():
+            self._connection = connect_sqlite(self.path)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, request TEXT NOT NULL, status TEXT NOT NULL, result TEXT, detail TEXT, "
+                "worker TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, claimed_at REAL, finished_at REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            self._conn_pid = os.getpid()
+            self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        return self._connection
+
+    def submit(self, request: dict) -> str:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, request, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (job_id, json.dumps(request), time.time()),
+            )
+        return job_id
+
+    def claim(self) -> Optional[dict]:
+        """Take the oldest queued job, or a running one whose lease expired, and mark it as running for this worker.
+        Expired jobs that were already claimed ``max_attempts`` times are marked as errors instead."""
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")  # One claimer at a time across processes
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = 'error', detail = ?, finished_at = ? WHERE status = 'running' AND claimed_at < ? AND attempts >= ?",
+                    (f"Gave up after {self.max_attempts} attempts; the workers answering the job stopped", now, now - self.lease_seconds, self.max_attempts),
+                )
+                row = conn.execute(
+                    "SELECT id, request, attempts FROM jobs WHERE status = 'queued' OR (status = 'running' AND claimed_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (now - self.lease_seconds,),
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = ?, claimed_at = ? WHERE id = ?",
+                        (self.worker_id, row[2] + 1, now, row[0]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "request": json.loads(row[1]), "attempts": row[2] + 1}
+
+    def renew(self, job_id: str) -> bool:
+        """Extend this worker's lease on a running job. False if the lease was lost to another worker."""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET claimed_at = ? WHERE id = ? AND worker = ? AND status = 'running'", (time.time(), job_id, self.worker_id)
+            ).rowcount == 1
+
+    def finish(self, job_id: str, status: str, result: Optional[dict] = None, detail: Optional[str] = None) -> bool:
+        """Store the outcome of a job this worker holds. False, and nothing is stored, if the lease was lost to another worker."""
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, detail = ?, finished_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (status, json.dumps(result) if result is not None else None, detail, time.time(), job_id, self.worker_id),
+            ).rowcount == 1
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, detail, worker, attempts, created_at, claimed_at, finished_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, result, detail, worker, attempts, created_at, claimed_at, finished_at = row
+        job = {"job_id": job_id, "status": status, "worker": worker, "attempts": attempts, "created_at": created_at}
+        if claimed_at is not None:
+            job["queued_seconds"] = round(claimed_at - created_at, 3)
+        if finished_at is not None:
+            job["seconds"] = round(finished_at - created_at, 3)
+        if result is not None:
+            job["result"] = json.loads(result)
+        if detail is not None:
+            job["detail"] = detail
+        return job
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (time.time() - self.result_ttl_seconds,)
+            ).rowcount
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {"path": self.path, "worker": self.worker_id, "jobs": dict(rows)}
+
+
+def build_job_queue() -> Optional[SQLiteJobQueue]:
+    """The job queue selected by JOB_QUEUE (``sqlite`` or ``off``), or None when off."""
+    if JOB_QUEUE in ("", "off", "none"):
+        return None
+    if JOB_QUEUE != "sqlite":
+        raise ValueError(f"Unknown JOB_QUEUE '{JOB_QUEUE}'. Use 'sqlite' or 'off'.")
+    return SQLiteJobQueue(JOB_QUEUE_PATH)
+
+
+async def keep_lease(queue: SQLiteJobQueue, job_id: str):
+    """Renew the lease on a job until cancelled, a few times per lease period."""
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        try:
+            if not await asyncio.to_thread(queue.renew, job_id):
+                logger.warning("Lost the lease on job %s to another worker", job_id)
+                return
+        except Exception:
+            logger.exception("Renewing the lease on job %s failed", job_id)
+
+
+async def finish_job(queue: SQLiteJobQueue, job_id: str, status: str, result: Optional[dict] = None, detail: Optional[str] = None):
+    if not await asyncio.to_thread(queue.finish, job_id, status, result, detail):
+        logger.warning("Dropped the outcome of job %s: another worker holds it now", job_id)
+
+
+async def consume_jobs(queue: SQLiteJobQueue, answer: Callable[[dict], Awaitable[dict]], poll_seconds: float = JOB_POLL_SECONDS):
+    """Claim and answer jobs one at a time, forever. Run ``JOB_CONCURRENCY`` of these per worker process."""
+    while True:
+        try:
+            job = await asyncio.to_thread(queue.claim)
+        except Exception:
+            logger.exception("Claiming a job failed")
+            job = None
+        if job is None:
+            await asyncio.sleep(poll_seconds)
+            continue
+        lease = asyncio.create_task(keep_lease(queue, job["id"]))
+        try:
+            result = await answer(job["request"])
+            status = "partial" if result.get("partial") else "success"
+            await finish_job(queue, job["id"], status, result)
+        except asyncio.CancelledError:
+            # Shutting down - leave the job running so another worker claims it when the lease runs out
+            raise
+        except Exception as e:
+            logger.exception("Job %s failed", job["id"])
+            await finish_job(queue, job["id"], "error", None, str(e))
+        finally:
+            lease.cancel()
+
+
+async def purge_forever(queue: SQLiteJobQueue, interval: float = 600):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(queue.purge)
+        except Exception:
+            logger.exception("Purging finished jobs failed")
@@ -0,0 +1,253 @@
+# backend/knowledge.py
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import Any, Optional, Type
+from pydantic import BaseModel, Field
+from langchain_core.tools import BaseTool
+from cache import connect_sqlite, cosine_similarity
+from validation import key_terms
+
+logger = logging.getLogger("brainchain")
+
+# Rank constant of reciprocal rank fusion, which merges the BM25 and vector rankings
+RRF_K = 60
+
+
+class KnowledgeStore:
+    """Persistent index of past research: the results of live Tavily searches.
+
+    Documents are ranked with SQLite FTS5's BM25 over their title, text and the query that found them,
+    and a document only matches when its title and text mention at least ``min_coverage`` of the query's key terms.
+    If an ``embeddings`` model (any LangChain ``Embeddings``) is given, documents within
+    ``min_similarity`` cosine similarity of the query match as well, and the two rankings are fused.
+    Search results rank above documents of any other ``source``, which are second-hand and may repeat a mistake.
+    Adding a document whose URL (or, without one, text) is already indexed replaces it and resets its
+    age. Documents older than ``max_age_seconds`` are stale: they are never returned, and are deleted
+    on the next write. The connection is opened lazily in each process, like ``SQLiteCacheBackend``.
+    """
+
+    def __init__(self, path: str, max_age_seconds: Optional[float] = 7 * 86400, max_documents: int = 10000,
+                 min_coverage: float = 0.6, embeddings=None, min_similarity: float = 0.8):
+        self.path = path
+        self.max_age_seconds = max_age_seconds
+        self.max_documents = max_documents
+        self.min_coverage = min_coverage
+        self.embeddings = embeddings
+        self.min_similarity = min_similarity
+        self.stats = {"searches": 0, "hits": 0, "misses": 0, "stale_skipped": 0, "indexed": 0, "search_seconds": 0.0, "hit_age_seconds": 0.0}
+        self._lock = threading.Lock()
+        self._conn_pid = None
+        self._connection = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._conn_pid != os.getpid():
+            self._connection = connect_sqlite(self.path)
+            self._connection.executescript(
+                "CREATE TABLE IF NOT EXISTS knowledge ("
+                "id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, source TEXT NOT NULL, url TEXT, title TEXT, "
+                "query TEXT, content TEXT NOT NULL, embedding TEXT, stored_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS knowledge_stored ON knowledge (stored_at);"
+                # External-content FTS5 index, kept in step with the table by the triggers
+                "CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(title, content, query, content='knowledge', content_rowid='id');"
+                "CREATE TRIGGER IF NOT EXISTS knowledge_ai AFTER INSERT ON knowledge BEGIN "
+                "INSERT INTO knowledge_fts (rowid, title, content, query) VALUES (new.id, new.title, new.content, new.query); END;"
+                "CREATE TRIGGER IF NOT EXISTS knowledge_ad AFTER DELETE ON knowledge BEGIN "
+                "INSERT INTO knowledge_fts (knowledge_fts, rowid, title, content, query) VALUES ('delete', old.id, old.title, old.content, old.query); END;"
+            )
+            self._conn_pid = os.getpid()
+        return self._connection
+
+    def _cutoff(self) -> float:
+        return time.time() - self.max_age_seconds if self.max_age_seconds is not None else float("-inf")
+
+    def add(self, content: str, source: str, url: Optional[str] = None, title: Optional[str] = None, query: Optional[str] = None) -> bool:
+        """Index one document, replacing an earlier copy of it. Returns False for empty text."""
+        content = (content or "").strip()
+        if not content:
+            return False
+        key = url or "sha1:" + hashlib.sha1(" ".join(content.lower().split()).encode()).hexdigest()
+        embedding = json.dumps(self.embeddings.embed_query(content[:2000])) if self.embeddings is not None else None
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM knowledge WHERE key = ?", (key,))
+                conn.execute(
+                    "INSERT INTO knowledge (key, source, url, title, query, content, embedding, stored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, source, url, title, query, content, embedding, time.time()),
+                )
+                conn.execute("DELETE FROM knowledge WHERE stored_at < ?", (self._cutoff(),))
+                conn.execute(
+                    "DELETE FROM knowledge WHERE id NOT IN (SELECT id FROM knowledge ORDER BY stored_at DESC LIMIT ?)",
+                    (self.max_documents,),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self.stats["indexed"] += 1
+        return True
+
+    def add_search_results(self, query: str, results) -> int:
+        """Index the results of a Tavily search (a list of dicts with ``url`` and ``content``). Returns how many were indexed."""
+        if not isinstance(results, list):
+            return 0
+        return sum(
+            self.add(result.get("content"), "tavily", url=result.get("url"), title=result.get("title"), query=query)
+            for result in results if isinstance(result, dict)
+        )
+
+    def _bm25(self, terms, limit: int):
+        # Every term is quoted, so FTS5 query syntax in the question cannot break the MATCH
+        match = " OR ".join('"{}"'.format(term.replace('"', "")) for term in terms)
+        return self._conn.execute(
+            "SELECT k.id, k.source, k.url, k.title, k.query, k.content, k.stored_at FROM knowledge_fts "
+            "JOIN knowledge k ON k.id = knowledge_fts.rowid WHERE knowledge_fts MATCH ? ORDER BY bm25(knowledge_fts) LIMIT ?",
+            (match, limit),
+        ).fetchall()
+
+    def _nearest(self, vector, limit: int):
+        rows = self._conn.execute(
+            "SELECT id, source, url, title, query, content, stored_at, embedding FROM knowledge WHERE embedding IS NOT NULL AND stored_at >= ?",
+            (self._cutoff(),),
+        ).fetchall()
+        scored = [(cosine_similarity(vector, json.loads(row[7])), row[:7]) for row in rows]
+        scored = [item for item in scored if item[0] >= self.min_similarity]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [row for _, row in scored[:limit]]
+
+    def search(self, query: str, k: int = 3) -> list:
+        """Up to ``k`` fresh documents relevant to ``query``, best first, each with its ``age_hours``."""
+        started = time.perf_counter()
+        terms = key_terms(query)
+        cutoff, now = self._cutoff(), time.time()
+        rankings, rows, stale = [], {}, 0
+        # Embedded before taking the lock, which would otherwise serialize every search behind the model
+        vector = self.embeddings.embed_query(query) if self.embeddings is not None else None
+        with self._lock:
+            if terms:
+                ranked = []
+                for row in self._bm25(terms, k * 5):
+                    if row[6] < cutoff:
+                        stale += 1
+                        continue
+                    text = " ".join(part or "" for part in (row[3], row[5])).lower()
+                    if sum(1 for term in terms if term in text) / len(terms) >= self.min_coverage:
+                        ranked.append(row)
+                rankings.append(ranked)
+            if vector is not None:
+                rankings.append(self._nearest(vector, k * 5))
+        scores = {}
+        for ranking in rankings:
+            for rank, row in enumerate(ranking):
+                rows[row[0]] = row
+                scores[row[0]] = scores.get(row[0], 0.0) + 1 / (RRF_K + rank + 1)
+        best = sorted(scores, key=lambda i: (rows[i][1] == "tavily", scores[i]), reverse=True)[:k]
+        results = [
+            {"source": rows[i][1], "url": rows[i][2], "title": rows[i][3], "content": rows[i][5], "age_hours": round((now - rows[i][6]) / 3600, 1)}
+            for i in best
+        ]
+        with self._lock:
+            self.stats["searches"] += 1
+            self.stats["hits" if results else "misses"] += 1
+            self.stats["stale_skipped"] += stale
+            self.stats["search_seconds"] += time.perf_counter() - started
+            if results:
+                self.stats["hit_age_seconds"] += now - rows[best[0]][6]
+        return results
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM knowledge").fetchone()[0]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            documents, oldest = self._conn.execute("SELECT COUNT(*), MIN(stored_at) FROM knowledge").fetchone()
+            stats = dict(self.stats)
+        searches, hits = stats["searches"], stats["hits"]
+        return {
+            "searches": searches,
+            "hits": hits,
+            "misses": stats["misses"],
+            "stale_skipped": stats["stale_skipped"],
+            "indexed": stats["indexed"],
+            "documents": documents,
+            "hit_rate": round(hits / searches, 4) if searches else 0.0,
+            "avg_search_ms": round(stats["search_seconds"] / searches * 1000, 3) if searches else None,
+            # Age of the best result of a hit, and of the oldest indexed document
+            "avg_hit_age_hours": round(stats["hit_age_seconds"] / hits / 3600, 2) if hits else None,
+            "oldest_document_hours": round((time.time() - oldest) / 3600, 2) if oldest else None,
+            "max_age_hours": round(self.max_age_seconds / 3600, 2) if self.max_age_seconds is not None else None,
+        }
+
+
+class KnowledgeQuery(BaseModel):
+    query: str = Field(description="What to look up.")
+
+
+class KnowledgeSearch(BaseTool):
+    """Exposes a ``KnowledgeStore`` to the researcher as a tool consulted before web search."""
+
+    name: str = "knowledge_base_search"
+    description: str = (
+        "Search the research results gathered for earlier questions, stored locally. It answers in milliseconds, "
+        "so use it before searching the web. Each result carries its age in hours; search the web when nothing "
+        "relevant comes back or the question needs more recent information."
+    )
+    args_schema: Type[BaseModel] = KnowledgeQuery
+    store: Any
+    k: int = 3
+
+    def _run(self, query: str, run_manager=None):
+        results = self.store.search(query, self.k)
+        return results or "No stored research matches this query."
+
+    async def _arun(self, query: str, run_manager=None):
+        return await asyncio.to_thread(self._run, query)
+
+
+def index_search_results(store: KnowledgeStore):
+    """``CachedTool`` ``on_result`` hook that indexes every live Tavily search."""
+    def on_result(args: dict, result):
+        try:
+            store.add_search_results(args.get("query", ""), result)
+        except Exception:
+            # A failed write must not fail the search that was already answered
+            logger.exception("Could not index search results")
+    return on_result
+
+
+def build_knowledge_store() -> Optional[KnowledgeStore]:
+    """Create the knowledge store described by the KNOWLEDGE_* environment variables, or None if disabled."""
+    kind = os.environ.get("KNOWLEDGE_BASE", "sqlite").lower()
+    if kind in ("", "off", "none"):
+        return None
+    if kind == "sqlite":
+        path = os.environ.get("KNOWLEDGE_BASE_PATH", "knowledge.db")
+    elif kind == "memory":
+        path = ":memory:"
+    else:
+        raise ValueError(f"Unknown KNOWLEDGE_BASE '{kind}'. Use 'sqlite', 'memory' or 'off'.")
+    max_age = os.environ.get("KNOWLEDGE_MAX_AGE_SECONDS", "604800")
+
+    embeddings = None
+    model_name = os.environ.get("KNOWLEDGE_EMBEDDING_MODEL")
+    if model_name:
+        # Vector search is optional and needs the fastembed package
+        from langchain_community.embeddings import FastEmbedEmbeddings
+        embeddings = FastEmbedEmbeddings(model_name=model_name)
+    return KnowledgeStore(
+        path,
+        max_age_seconds=float(max_age) if max_age else None,
+        max_documents=int(os.environ.get("KNOWLEDGE_MAX_DOCUMENTS", "10000")),
+        min_coverage=float(os.environ.get("KNOWLEDGE_MIN_COVERAGE", "0.6")),
+        embeddings=embeddings,
+        min_similarity=float(os.environ.get("KNOWLEDGE_SIMILARITY", "0.8")),
+    )
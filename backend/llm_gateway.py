@@ -0,0 +1,231 @@
+# backend/llm_gateway.py
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, List, Optional
+from pydantic import PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+from metrics import REGISTRY
+
+logger = logging.getLogger("brainchain")
+
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_SECONDS = float(os.environ.get("LLM_BACKOFF_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.environ.get("LLM_BACKOFF_MAX_SECONDS", "8"))
+LLM_HEDGE_PERCENTILE = float(os.environ["LLM_HEDGE_PERCENTILE"]) if os.environ.get("LLM_HEDGE_PERCENTILE") else None
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Throttling, timeouts and server-side failures; anything else (bad request, auth) fails straight away
+RETRYABLE_STATUS = (408, 409, 429)
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError")
+
+LLM_HEDGES = REGISTRY.counter("brainchain_llm_hedged_requests_total", "Duplicate LLM requests sent because the first was slower than the hedge delay.")
+LLM_FALLBACKS = REGISTRY.counter("brainchain_llm_fallbacks_total", "LLM calls answered by a fallback model.", ["model"])
+LLM_FAILURES = REGISTRY.counter("brainchain_llm_failures_total", "LLM calls that failed after every retry and fallback.")
+
+
+class LLMUnavailable(Exception):
+    """Every model behind the gateway failed with a retryable error."""
+
+
+def _status_of(error) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    status = _status_of(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_after(error) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _model_name(model) -> str:
+    return getattr(model, "model_name", None) or getattr(model, "model", None) or type(model).__name__
+
+
+class LLMGateway(BaseChatModel):
+    """Chat model that puts retries, timeouts, hedging and failover in front of one or more provider models.
+
+    Every attempt waits for the shared ``limiter`` (a token bucket) and is cut off after
+    ``timeout_seconds``. Throttling (429), server errors and timeouts are retried up to
+    ``max_retries`` times with jittered exponential backoff, honouring ``Retry-After``; then the
+    next model in ``fallbacks`` is tried. With ``hedge_percentile`` set, a duplicate request is sent
+    when the first is slower than that percentile of recent latencies, and the first answer wins.
+
+    Tool binding and structured output are delegated to the primary model's formatting, so the
+    gateway can stand in for it anywhere, including inside the ReAct agents. Streamed calls are
+    retried only until the first chunk arrives.
+    """
+
+    primary: BaseChatModel
+    fallbacks: List[BaseChatModel] = []
+    limiter: Any = None
+    timeout_seconds: float = LLM_TIMEOUT_SECONDS
+    max_retries: int = LLM_MAX_RETRIES
+    backoff_seconds: float = LLM_BACKOFF_SECONDS
+    backoff_max_seconds: float = LLM_BACKOFF_MAX_SECONDS
+    hedge_percentile: Optional[float] = LLM_HEDGE_PERCENTILE
+    hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES
+
+    _latencies: deque = PrivateAttr(default_factory=lambda: deque(maxlen=200))
+
+    @property
+    def _llm_type(self) -> str:
+        return "llm-gateway"
+
+    @property
+    def model_name(self) -> str:
+        return _model_name(self.primary)
+
+    def with_fallback(self, *models: BaseChatModel) -> "LLMGateway":
+        """A gateway with the same settings, limiter and latency history that fails over to ``models``."""
+        gateway = self.model_copy(update={"fallbacks": list(self.fallbacks) + list(models)})
+        gateway._latencies = self._latencies
+        return gateway
+
+    def bind_tools(self, tools, **kwargs):
+        # Let the provider format the tools and tool_choice, then bind the result to the gateway
+        return self.bind(**self.primary.bind_tools(tools, **kwargs).kwargs)
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile is None or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+
+    def _backoff(self, attempt: int, error) -> float:
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_seconds * 2 ** attempt))
+        return max(delay, min(_retry_after(error), self.backoff_max_seconds))
+
+    async def _attempt(self, model, messages, stop, kwargs) -> ChatResult:
+        if self.limiter is not None:
+            await self.limiter.aacquire()
+        started = time.perf_counter()
+        result = await asyncio.wait_for(model._agenerate(messages, stop=stop, **kwargs), self.timeout_seconds)
+        if model is self.primary:
+            self._latencies.append(time.perf_counter() - started)
+        return result
+
+    async def _hedged(self, model, messages, stop, kwargs) -> ChatResult:
+        delay = self.hedge_delay()
+        first = asyncio.ensure_future(self._attempt(model, messages, stop, kwargs))
+        if delay is None:
+            return await first
+        started = [first]  # Every attempt, for the cleanup below; `pending` shrinks as attempts finish
+        try:
+            done, _ = await asyncio.wait(started, timeout=delay)
+            if not done:
+                LLM_HEDGES.inc()
+                started.append(asyncio.ensure_future(self._attempt(model, messages, stop, kwargs)))
+            error = None
+            pending = set(started)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The losing attempts' outcomes no longer matter; retrieve them so asyncio does not log them,
+            # including a failure that finished in the same batch as the winner
+            for task in started:
+                if not task.done():
+                    task.cancel()
+                    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                elif not task.cancelled():
+                    task.exception()
+
+    def _failed(self, error) -> LLMUnavailable:
+        LLM_FAILURES.inc()
+        return LLMUnavailable(f"LLM unavailable after {self.max_retries + 1} attempts per model: {error!r}")
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        error = None
+        for model in [self.primary, *self.fallbacks]:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await self._hedged(model, messages, stop, kwargs)
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    error = e
+                    if attempt == self.max_retries:
+                        break
+                    delay = self._backoff(attempt, e)
+                    if run_manager is not None:
+                        await run_manager.on_retry(SimpleNamespace(attempt_number=attempt + 1, idle_for=delay, outcome=None))
+                    logger.info("LLM %s failed (%r), retrying in %.2fs", _model_name(model), e, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                if model is not self.primary:
+                    LLM_FALLBACKS.inc(model=_model_name(model))
+                return result
+            logger.warning("LLM %s unavailable: %r", _model_name(model), error)
+        raise self._failed(error)
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        error = None
+        for model in [self.primary, *self.fallbacks]:
+            for attempt in range(self.max_retries + 1):
+                stream = model._astream(messages, stop=stop, **kwargs)
+                try:
+                    if self.limiter is not None:
+                        await self.limiter.aacquire()
+                    first = await asyncio.wait_for(stream.__anext__(), self.timeout_seconds)
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    await stream.aclose()
+                    if not is_retryable(e):
+                        raise
+                    error = e
+                    if attempt == self.max_retries:
+                        break
+                    await asyncio.sleep(self._backoff(attempt, e))
+                    continue
+                # Tokens are on their way to the client from here on, so the rest of the stream is not retried
+                if model is not self.primary:
+                    LLM_FALLBACKS.inc(model=_model_name(model))
+                yield first
+                async for chunk in stream:
+                    yield chunk
+                return
+            logger.warning("LLM %s unavailable: %r", _model_name(model), error)
+        raise self._failed(error)
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        # Blocking callers get the retries and failover, without hedging or timeouts
+        error = None
+        for model in [self.primary, *self.fallbacks]:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    if self.limiter is not None:
+                        self.limiter.acquire()
+                    return model._generate(messages, stop=stop, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e):
+                        raise
+                    error = e
+                    if attempt < self.max_retries:
+                        time.sleep(self._backoff(attempt, e))
+        raise self._failed(error)
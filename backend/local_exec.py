@@ -0,0 +1,134 @@
+# backend/local_exec.py
+import os
+import ast
+import asyncio
+from typing import Any, Callable, Type
+from pydantic import BaseModel, Field, PrivateAttr
+from langchain_core.tools import BaseTool, ToolException
+from sandbox import SandboxError, SandboxPool
+
+# Modules a snippet may import and still count as safe to run locally: pure computation, no I/O. Libraries
+# such as sympy (sympify evaluates strings) and numpy (load, fromfile, save) reach past what the AST check sees.
+SAFE_MODULES = frozenset({
+    "math", "cmath", "statistics", "decimal", "fractions", "random", "itertools", "functools", "operator",
+    "collections", "heapq", "bisect", "re", "string", "json", "datetime", "calendar", "time", "numbers",
+    "typing", "dataclasses", "enum", "textwrap",
+})
+# Name of Riza's ExecPython tool, which the local tool takes so prompts and cache keys do not change with CODE_EXECUTOR
+RIZA_TOOL_NAME = "riza_exec_python"
+# Builtins that reach outside the computation
+UNSAFE_NAMES = frozenset({"open", "exec", "eval", "compile", "__import__", "input", "breakpoint", "globals", "locals", "vars", "getattr", "setattr", "delattr"})
+
+
+def is_safe_code(code: str) -> bool:
+    """Whether a snippet only computes: it parses, imports nothing outside SAFE_MODULES, calls no I/O or
+    reflection builtins and touches no dunder attributes. Anything else goes to the remote executor."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split(".")[0] not in SAFE_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or (node.module or "").split(".")[0] not in SAFE_MODULES:
+                return False
+        elif isinstance(node, ast.Name) and node.id in UNSAFE_NAMES:
+            return False
+        elif isinstance(node, ast.Attribute) and node.attr.startswith("__"):
+            return False
+    return True
+
+
+class CodeInput(BaseModel):
+    code: str = Field(description="The Python code to execute.")
+
+
+class LocalExecPython(BaseTool):
+    """Runs Python on a local ``SandboxPool`` instead of a remote service.
+
+    Behaves like Riza's ExecPython: it returns what the code printed to stdout, and a non-zero exit
+    is reported to the agent as a tool error carrying stderr.
+    """
+
+    name: str = "local_exec_python"
+    description: str = "Execute Python code to solve problems. Only the standard library is available. Always print output to stdout."
+    args_schema: Type[BaseModel] = CodeInput
+    handle_tool_error: bool = True
+    pool: Any
+
+    def _run(self, code: str, run_manager=None) -> str:
+        try:
+            result = self.pool.run(code)
+        except SandboxError as e:
+            raise ToolException(str(e))
+        if result["exit_code"]:
+            raise ToolException(f"Code execution returned a non-zero exit code. The output captured from stderr was:\n{result['stderr']}")
+        return result["stdout"]
+
+    async def _arun(self, code: str, run_manager=None) -> str:
+        return await asyncio.to_thread(self._run, code)
+
+    def warm(self):
+        self.pool.warm()
+
+    def get_stats(self) -> dict:
+        return {"local": self.pool.get_stats()}
+
+
+class RoutedExecPython(BaseTool):
+    """Sends snippets that ``is_safe_code`` accepts to the ``local`` executor and everything else to ``remote``.
+
+    Exposes the remote tool's name, description and arguments, so agents and the tool cache see the same tool.
+    """
+
+    local: BaseTool
+    remote: BaseTool
+    handle_tool_error: bool = True
+    _routed: dict = PrivateAttr(default_factory=lambda: {"local": 0, "remote": 0})
+
+    def __init__(self, local: BaseTool, remote: BaseTool, **kwargs):
+        # Errors are handled here, or by a wrapper that takes over handle_tool_error, not by the tool that ran
+        local.handle_tool_error = remote.handle_tool_error = False
+        super().__init__(local=local, remote=remote, name=remote.name, description=remote.description, args_schema=remote.args_schema, **kwargs)
+
+    def _pick(self, code: str) -> BaseTool:
+        target = "local" if is_safe_code(code) else "remote"
+        self._routed[target] += 1
+        return self.local if target == "local" else self.remote
+
+    def _run(self, code: str, run_manager=None) -> str:
+        return self._pick(code).invoke({"code": code})
+
+    async def _arun(self, code: str, run_manager=None) -> str:
+        return await self._pick(code).ainvoke({"code": code})
+
+    def warm(self):
+        self.local.warm()
+
+    def get_stats(self) -> dict:
+        return {"routed": dict(self._routed), **self.local.get_stats()}
+
+
+def build_code_executor(remote: Callable[[], BaseTool]) -> BaseTool:
+    """The code tool selected by CODE_EXECUTOR: ``riza`` (the tool ``remote()`` builds), ``local`` (the sandbox
+    pool only; ``remote`` is never called, so no Riza key is needed) or ``auto`` (safe snippets locally, the
+    rest remotely). The local tool takes Riza's tool name, so prompts and cache keys do not change with the setting."""
+    kind = os.environ.get("CODE_EXECUTOR", "riza").lower()
+    if kind not in ("riza", "local", "auto"):
+        raise ValueError(f"Unknown CODE_EXECUTOR '{kind}'. Use 'riza', 'local' or 'auto'.")
+    if kind == "riza":
+        return remote()
+    pool = SandboxPool(
+        size=int(os.environ.get("SANDBOX_WORKERS", "2")),
+        memory_mb=int(os.environ.get("SANDBOX_MEMORY_MB", "256")),
+        cpu_seconds=float(os.environ.get("SANDBOX_CPU_SECONDS", "5")),
+        timeout_seconds=float(os.environ.get("SANDBOX_TIMEOUT_SECONDS", "10")),
+        max_jobs_per_worker=int(os.environ.get("SANDBOX_MAX_JOBS_PER_WORKER", "100")),
+        user=os.environ.get("SANDBOX_USER", "nobody"),
+    )
+    if kind == "local":
+        return LocalExecPython(pool=pool, name=RIZA_TOOL_NAME)
+    remote_tool = remote()
+    return RoutedExecPython(local=LocalExecPython(pool=pool, args_schema=remote_tool.args_schema), remote=remote_tool)
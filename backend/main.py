@@ -1,15 +1,62 @@
 # backend/main.py
 import os
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from workflow import run_workflow  # Import the workflow
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from fastapi.encoders import jsonable_encoder
+from typing import List, Optional
+from pydantic import BaseModel, Field
+from workflow import arun_workflow, astream_workflow, init_workflow, knowledge_store, router, speculator, tools, validator  # Import the async workflow entry point
+from budget import Budget
+from cache import build_response_cache
+from batch import BATCH_MAX_QUERIES, run_batch
+from threads import CHECKPOINT_PATH, CHECKPOINTER, ThreadRegistry, open_checkpointer
+from admission import ADMISSION_API_KEYS, Overloaded, build_admission, resolve_priority
+from jobs import JOB_ADMISSION_RETRIES, JOB_CONCURRENCY, build_job_queue, consume_jobs, purge_forever
+from responses import ResponseMode, dumps, render_json, shape_result
+import compaction
+from metrics import REGISTRY
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-app = FastAPI()
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("brainchain")
+
+# Last use of every conversation thread, so idle threads can be deleted from the checkpointer
+thread_registry = ThreadRegistry(CHECKPOINT_PATH if CHECKPOINTER == "sqlite" else ":memory:")  # Shared by all workers with the SQLite checkpointer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with open_checkpointer() as checkpointer:
+        # Compile the graph and build the ReAct agents once, before the first request arrives
+        # (under gunicorn with preloading they were already built before the worker was forked)
+        app.state.startup_seconds = init_workflow(checkpointer, reuse=True)
+        app.state.checkpointer = checkpointer
+        logger.info("Workflow ready in %.1f ms", app.state.startup_seconds * 1000)
+        # Start this worker's local sandbox processes (CODE_EXECUTOR=local or auto) so the first snippet does not wait for them
+        for tool in tools:
+            if hasattr(tool.tool, "warm"):
+                await asyncio.to_thread(tool.tool.warm)
+        background = []
+        if checkpointer is not None:
+            await thread_registry.load(checkpointer)
+            background.append(asyncio.create_task(thread_registry.evict_forever(checkpointer)))
+        if job_queue is not None:
+            background += [asyncio.create_task(consume_jobs(job_queue, answer_job)) for _ in range(JOB_CONCURRENCY)]
+            background.append(asyncio.create_task(purge_forever(job_queue)))
+        yield
+        for task in background:
+            task.cancel()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -20,13 +67,274 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Maximum number of workflows executing at once in this worker; extra requests wait in bounded priority
+# queues and are refused with 429/503 and Retry-After once those are full or they have waited too long
+WORKFLOW_CONCURRENCY = int(os.environ.get("WORKFLOW_CONCURRENCY", "16"))
+admission = build_admission(WORKFLOW_CONCURRENCY)
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
+def request_priority(http_request: Request, default: str) -> str:
+    """Priority class from the X-API-Key (see ADMISSION_API_KEYS) or X-Priority header, else the endpoint's default."""
+    return resolve_priority(default, http_request.headers.get("x-api-key"), http_request.headers.get("x-priority"), ADMISSION_API_KEYS)
+
+# Responses to repeated questions are served from this cache instead of re-running the agents (None when disabled)
+response_cache = build_response_cache()
+STREAM_CACHE_NAMESPACE = "stream"
+
+# Queued jobs shared by every worker process; each worker runs JOB_CONCURRENCY consumers (None when disabled)
+job_queue = build_job_queue()
+
+# Totals kept by the caches and the router, refreshed into gauges whenever /metrics is scraped
+RESPONSE_CACHE_EVENTS = REGISTRY.gauge("brainchain_response_cache_events", "Response cache lookups and stores so far.", ["event"])
+TOOL_CACHE_EVENTS = REGISTRY.gauge("brainchain_tool_cache_events", "Tool cache calls, hits, misses, coalesced calls and errors so far.", ["tool", "event"])
+KNOWLEDGE_EVENTS = REGISTRY.gauge("brainchain_knowledge_events", "Knowledge base searches, hits, misses, skipped stale documents and indexed documents so far.", ["event"])
+KNOWLEDGE_DOCUMENTS = REGISTRY.gauge("brainchain_knowledge_documents", "Documents in the knowledge base.")
+KNOWLEDGE_OLDEST_HOURS = REGISTRY.gauge("brainchain_knowledge_oldest_document_hours", "Age of the oldest document in the knowledge base.")
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge("brainchain_admission_queue_depth", "Requests waiting for a workflow slot.", ["priority"])
+ADMISSION_INFLIGHT = REGISTRY.gauge("brainchain_admission_inflight", "Workflows running in this worker.")
+COMPACTION_TOKENS = REGISTRY.gauge("brainchain_compaction_tokens", "Approximate prompt tokens before and after compaction so far.", ["node", "stage"])
+
+def collect_component_stats():
+    if response_cache is not None:
+        for event in ("exact_hits", "semantic_hits", "misses", "stores"):
+            RESPONSE_CACHE_EVENTS.set(response_cache.stats[event], event=event)
+    for tool in tools:
+        tool_stats = tool.get_stats()
+        for event in ("calls", "hits", "misses", "coalesced", "errors"):
+            TOOL_CACHE_EVENTS.set(tool_stats[event], tool=tool.name, event=event)
+    if knowledge_store is not None:
+        knowledge_stats = knowledge_store.get_stats()
+        for event in ("searches", "hits", "misses", "stale_skipped", "indexed"):
+            KNOWLEDGE_EVENTS.set(knowledge_stats[event], event=event)
+        KNOWLEDGE_DOCUMENTS.set(knowledge_stats["documents"])
+        KNOWLEDGE_OLDEST_HOURS.set(knowledge_stats["oldest_document_hours"] or 0)
+    for priority, depth in admission.queue_depth().items():
+        ADMISSION_QUEUE_DEPTH.set(depth, priority=priority)
+    ADMISSION_INFLIGHT.set(admission.inflight)
+    for node, totals in compaction.stats.items():
+        COMPACTION_TOKENS.set(totals["tokens_before"], node=node, stage="before")
+        COMPACTION_TOKENS.set(totals["tokens_after"], node=node, stage="after")
+
+REGISTRY.add_collector(collect_component_stats)
+
 class QueryRequest(BaseModel):
     text: str
+    budget: Optional[Budget] = None  # Limits left unset fall back to the server defaults
+    thread_id: Optional[str] = Field(default=None, min_length=1, max_length=128)  # Continue this conversation; earlier turns are kept server-side
+
+class JobRequest(BaseModel):
+    text: str
+    budget: Optional[Budget] = None
+    mode: ResponseMode = "final"  # Shape of the stored result
+
+class BatchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=BATCH_MAX_QUERIES)
+    budget: Optional[Budget] = None  # Applied to every query in the batch
+
+async def answer_query(text: str, budget: Optional[Budget] = None, thread_id: Optional[str] = None, priority: str = "interactive"):
+    """Answer one query from the response cache or by running the workflow. Returns (result, cached).
+
+    Queries in a conversation thread bypass the response cache: their answer depends on the earlier turns.
+    Cache hits skip admission; a workflow run waits for a slot in the ``priority`` queue and raises ``Overloaded`` if refused.
+    """
+    if response_cache is not None and thread_id is None:
+        cached = await asyncio.to_thread(response_cache.get, text)
+        if cached is not None:
+            return cached, True
+    if thread_id is not None:
+        await asyncio.to_thread(thread_registry.touch, thread_id)
+    async with admission.slot(priority):
+        result = await arun_workflow(text, budget, thread_id)
+    result = jsonable_encoder(result)
+    # Runs cut short by their budget are not cached, so the next request gets a full attempt
+    if response_cache is not None and thread_id is None and not result.get("partial"):
+        await asyncio.to_thread(response_cache.set, text, result)
+    return result, False
+
+async def answer_job(request: dict) -> dict:
+    job = JobRequest(**request)
+    for attempt in range(JOB_ADMISSION_RETRIES + 1):
+        try:
+            result, _ = await answer_query(job.text, job.budget, priority="batch")
+            return shape_result(result, job.mode)
+        except Overloaded as e:
+            # A queued job is already stored, so when shed it waits and tries again rather than failing at once;
+            # its lease is renewed meanwhile, and after JOB_ADMISSION_RETRIES the job fails with the last refusal
+            if attempt == JOB_ADMISSION_RETRIES:
+                raise
+            await asyncio.sleep(e.retry_after)
 
 @app.post("/process")
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request, mode: ResponseMode = "full"):
+    if request.thread_id is not None and getattr(app.state, "checkpointer", None) is None:
+        raise HTTPException(status_code=400, detail="Conversation threads are disabled on this server")
     try:
-        result = run_workflow(request.text)
-        return {"status": "success", "result": result}
+        result, cached = await answer_query(request.text, request.budget, request.thread_id, request_priority(http_request, "interactive"))
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    payload = {"status": "success", "result": shape_result(result, mode)}
+    if cached:
+        payload["cached"] = True
+    return render_json(http_request, payload)
+
+@app.post("/process/stream")
+async def process_query_stream(request: QueryRequest, http_request: Request):
+    if request.thread_id is not None and getattr(app.state, "checkpointer", None) is None:
+        raise HTTPException(status_code=400, detail="Conversation threads are disabled on this server")
+    # Newline-delimited JSON: one event per line, flushed as soon as each agent produces output
+    use_cache = response_cache is not None and request.thread_id is None
+    # Streamed transcripts are cached apart from /process results: they hold only each message's name and content
+    cached = await asyncio.to_thread(response_cache.get, request.text, STREAM_CACHE_NAMESPACE) if use_cache else None
+
+    if cached is not None:
+        async def replay():
+            # Replay the stored transcript, skipping the user's own question
+            for message in cached["messages"][1:]:
+                yield json.dumps({"type": "message", "node": message.get("name"), "name": message.get("name"), "content": message.get("content")}) + "\n"
+            yield json.dumps({"type": "done", "cached": True}) + "\n"
+
+        return StreamingResponse(replay(), media_type="application/x-ndjson")
+
+    # Admitted before the response starts, so an overloaded server can still answer with 429/503
+    await admission.acquire(request_priority(http_request, "interactive"))
+    started = time.perf_counter()
+    slot = {"held": True}
+
+    def release():
+        # Called when the stream ends, and again after the response as a safety net if the stream never started
+        if slot["held"]:
+            slot["held"] = False
+            admission.release(time.perf_counter() - started)
+
+    async def events():
+        messages = [{"type": "human", "name": None, "content": request.text}]
+        partial = False
+        if request.thread_id is not None:
+            await asyncio.to_thread(thread_registry.touch, request.thread_id)
+        try:
+            async for event in astream_workflow(request.text, request.budget, request.thread_id):
+                if event["type"] == "message":
+                    messages.append({"type": "human", "name": event["name"], "content": event["content"]})
+                elif event["type"] == "partial":
+                    partial = True
+                yield json.dumps(event) + "\n"
+            yield json.dumps({"type": "done"}) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+            return
+        finally:
+            release()
+        if use_cache and not partial:
+            await asyncio.to_thread(response_cache.set, request.text, {"messages": messages}, STREAM_CACHE_NAMESPACE)
+
+    return StreamingResponse(events(), media_type="application/x-ndjson", background=BackgroundTask(release))
+
+@app.post("/process/batch")
+async def process_batch(request: BatchRequest, http_request: Request, mode: ResponseMode = "full"):
+    # Newline-delimited JSON: one item per query in completion order, then a summary line
+    priority = request_priority(http_request, "batch")
+
+    async def answer(text):
+        result, _ = await answer_query(text, request.budget, priority=priority)
+        return shape_result(result, mode)
+
+    async def items():
+        counts = {}
+        async for item in run_batch(request.queries, answer):
+            counts[item["status"]] = counts.get(item["status"], 0) + 1
+            yield dumps(item) + b"\n"
+        yield dumps({"type": "done", "total": len(request.queries), **counts}) + b"\n"
+
+    return StreamingResponse(items(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    # Answered in the background by whichever worker process claims it first; poll GET /jobs/{job_id}
+    if job_queue is None:
+        raise HTTPException(status_code=404, detail="The job queue is disabled")
+    job_id = await asyncio.to_thread(job_queue.submit, request.model_dump(mode="json"))
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/stats")
+async def job_stats():
+    if job_queue is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(job_queue.get_stats)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, http_request: Request):
+    if job_queue is None:
+        raise HTTPException(status_code=404, detail="The job queue is disabled")
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return render_json(http_request, job)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "pid": os.getpid(), "startup_seconds": getattr(app.state, "startup_seconds", None)}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if response_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **response_cache.get_stats()}
+
+@app.get("/tools/stats")
+async def tool_stats():
+    # Tools that run code locally add their sandbox pool and routing counters under "executor"
+    return {
+        tool.name: {**tool.get_stats(), **({"executor": tool.tool.get_stats()} if hasattr(tool.tool, "get_stats") else {})}
+        for tool in tools
+    }
+
+@app.get("/knowledge/stats")
+async def knowledge_stats():
+    if knowledge_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(knowledge_store.get_stats)}
+
+@app.get("/compaction/stats")
+async def compaction_stats():
+    return {"enabled": compaction.COMPACTION_ENABLED, "nodes": compaction.stats}
+
+@app.get("/threads/stats")
+async def thread_stats():
+    if getattr(app.state, "checkpointer", None) is None:
+        return {"enabled": False}
+    return {"enabled": True, "checkpointer": type(app.state.checkpointer).__name__, **(await asyncio.to_thread(thread_registry.get_stats))}
+
+@app.delete("/threads/{thread_id}")
+async def delete_thread(thread_id: str):
+    # Forget a conversation, e.g. when the user starts a new chat
+    if getattr(app.state, "checkpointer", None) is None:
+        raise HTTPException(status_code=404, detail="Conversation threads are disabled")
+    await app.state.checkpointer.adelete_thread(thread_id)
+    await asyncio.to_thread(thread_registry.forget, thread_id)
+    return {"status": "deleted", "thread_id": thread_id}
+
+@app.get("/routing/stats")
+async def routing_stats():
+    return router.get_stats()
+
+@app.get("/validation/stats")
+async def validation_stats():
+    return validator.get_stats()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    return admission.get_stats()
+
+@app.get("/speculation/stats")
+async def speculation_stats():
+    return speculator.get_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
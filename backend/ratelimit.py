@@ -0,0 +1,14 @@
+# backend/ratelimit.py
+import os
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+def provider_rate_limiter(env_name: str):
+    """Process-wide limiter for one provider, or None when ``env_name`` (requests per second) is unset.
+
+    The limiter is shared by every request in the worker, interactive and batch alike.
+    """
+    rate = os.environ.get(env_name)
+    if not rate:
+        return None
+    rate = float(rate)
+    return InMemoryRateLimiter(requests_per_second=rate, check_every_n_seconds=min(0.1, 1 / rate), max_bucket_size=max(1, rate))
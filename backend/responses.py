@@ -0,0 +1,63 @@
+# backend/responses.py
+import os
+import gzip
+import json
+from types import SimpleNamespace
+from typing import Literal
+from fastapi import Request
+from fastapi.responses import Response
+from compaction import best_answer
+
+try:
+    import orjson
+except ImportError:  # Falls back to the standard library encoder
+    orjson = None
+
+# How much of the run a response carries:
+#   final   - the answer only
+#   summary - name and content of every message of the run
+#   full    - the whole serialized graph state, including LangChain message metadata
+ResponseMode = Literal["final", "summary", "full"]
+
+# Responses at least this large are gzipped for clients that accept it (empty disables compression)
+RESPONSE_GZIP_MIN_BYTES = os.environ.get("RESPONSE_GZIP_MIN_BYTES", "1024")
+GZIP_MIN_BYTES = int(RESPONSE_GZIP_MIN_BYTES) if RESPONSE_GZIP_MIN_BYTES else None
+
+# Keys added next to the messages by the workflow, kept in every mode
+RESULT_KEYS = ("partial", "stopped_by", "thread_id")
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def shape_result(result: dict, mode: ResponseMode = "full") -> dict:
+    """Cut a JSON-encoded workflow result down to ``mode``."""
+    if mode == "full":
+        return result
+    messages = result.get("messages", [])
+    shaped = {key: result[key] for key in RESULT_KEYS if key in result}
+    if mode == "summary":
+        shaped["messages"] = [{"type": m.get("type"), "name": m.get("name"), "content": m.get("content")} for m in messages]
+        if "answer" in result:
+            shaped["answer"] = result["answer"]
+        return shaped
+    answer = result.get("answer")
+    if answer is None and not result.get("partial"):
+        answer = best_answer([SimpleNamespace(name=m.get("name"), content=m.get("content")) for m in messages])
+        if answer is None and messages:
+            answer = messages[-1].get("content")
+    shaped["answer"] = answer
+    return shaped
+
+
+def render_json(request: Request, payload, status_code: int = 200) -> Response:
+    """Serialize ``payload`` with orjson when available, gzipped when the client accepts it and it is large enough."""
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if GZIP_MIN_BYTES is not None and len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
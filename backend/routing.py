@@ -0,0 +1,148 @@
+# backend/routing.py
+import os
+import re
+import time
+from typing import Literal, Optional
+from pydantic import BaseModel, Field
+from compaction import split_turns
+
+# Define a routing decision and the tier that made it
+class RouteDecision(BaseModel):
+    next: Literal["enhancer", "researcher", "coder"]
+    reason: str
+    fan_out: bool = False  # Dispatch the researcher and coder in parallel
+    tier: str = "llm"
+    confidence: float = 1.0
+
+
+ARITHMETIC = re.compile(r"^[\d\s.,+\-*/^%()=?x×÷]+$")
+CODER_KEYWORDS = re.compile(
+    r"\b(calculate|compute|calculation|sum|average|mean|median|percent(age)?|ratio|cagr|"
+    r"solve|equation|integral|derivative|python|code|script|function|algorithm|convert|factorial|prime)\b"
+)
+RESEARCHER_KEYWORDS = re.compile(
+    r"\b(who|when|where|what is|what are|what was|latest|news|current|today|history|population|capital|"
+    r"price|gdp|ceo|founded|released|explain|describe|tell me about|look up|lookup|search|find|research|"
+    r"revenue|sales|earnings|profit|income|market cap|stock|shares|inflation|unemployment|statistics|data|report)\b"
+)
+# Confidence of a single-worker keyword rule by the number of keywords matched; literals, so one match is
+# exactly the default ROUTER_MIN_CONFIDENCE (0.7 + 0.1 is 0.7999999999999999 in floating point)
+KEYWORD_CONFIDENCE = (0.0, 0.8, 0.9, 0.95)
+# Below the default ROUTER_MIN_CONFIDENCE: keywords of both kinds also co-occur in single-worker queries
+# ("find the derivative"), so whether to fan out is left to the next tier
+FAN_OUT_CONFIDENCE = 0.6
+
+
+def _named(messages, name):
+    return [m for m in messages if getattr(m, "name", None) == name]
+
+
+class RuleRouter:
+    """Deterministic tier: regex and keyword rules for routes that do not need a 70B model to decide.
+
+    Returns None when no rule applies, leaving the decision to the next tier.
+    """
+
+    tier = "rules"
+
+    async def route(self, messages, config=None) -> Optional[RouteDecision]:
+        # Only the current turn of a conversation thread counts; earlier turns were already answered
+        _, messages = split_turns(messages)
+        question = str(messages[0].content).strip()
+        latest = messages[-1] if len(messages) > 1 else None
+        if latest is not None and getattr(latest, "name", None) == "validator":
+            # The validator rejected an answer - working out what went wrong needs the LLM
+            return None
+        if ARITHMETIC.match(question) and any(c.isdigit() for c in question):
+            return RouteDecision(next="coder", reason="The query is a pure arithmetic expression.", tier=self.tier, confidence=0.95)
+        enhanced = _named(messages, "enhancer")
+        if not enhanced:
+            return RouteDecision(next="enhancer", reason="New query; refining it before research or computation.", tier=self.tier, confidence=0.85)
+        if _named(messages, "researcher") or _named(messages, "coder"):
+            return None
+        text = f"{question} {enhanced[-1].content}".lower()
+        wants_code = len(CODER_KEYWORDS.findall(text))
+        wants_research = len(RESEARCHER_KEYWORDS.findall(text))
+        if wants_code and not wants_research:
+            return RouteDecision(next="coder", reason="The enhanced query asks for a calculation or code.", tier=self.tier, confidence=KEYWORD_CONFIDENCE[min(wants_code, 3)])
+        if wants_research and not wants_code:
+            return RouteDecision(next="researcher", reason="The enhanced query asks for information.", tier=self.tier, confidence=KEYWORD_CONFIDENCE[min(wants_research, 3)])
+        if wants_research and wants_code:
+            return RouteDecision(
+                next="researcher", fan_out=True, tier=self.tier, confidence=FAN_OUT_CONFIDENCE,
+                reason="The query needs both information and a calculation; the researcher gathers the facts while the coder works on the computation.",
+            )
+        return None
+
+
+class SmallModelRoute(BaseModel):
+    next: Literal["enhancer", "researcher", "coder"] = Field(description="The next worker: 'enhancer', 'researcher' or 'coder'.")
+    reason: str = Field(description="Short reason for the choice.")
+    fan_out: bool = Field(default=False, description="True when the researcher and coder should work in parallel on a multi-part query.")
+    confidence: float = Field(description="How sure you are that this is the right worker, from 0 to 1.")
+
+
+class SmallModelRouter:
+    """Small-model tier: a cheap structured-output call that reports its own confidence."""
+
+    tier = "small_model"
+
+    def __init__(self, llm, system_prompt: str):
+        self.router = llm.with_structured_output(SmallModelRoute)
+        self.system_prompt = system_prompt
+
+    async def route(self, messages, config=None) -> Optional[RouteDecision]:
+        response = await self.router.ainvoke([{"role": "system", "content": self.system_prompt}] + list(messages), config)
+        return RouteDecision(next=response.next, reason=response.reason, fan_out=response.fan_out, tier=self.tier, confidence=response.confidence)
+
+
+class RoutingLayer:
+    """Runs the fast tiers in order and keeps the first decision at or above ``min_confidence``.
+
+    ``route`` returns None when every tier abstains or is unsure, and the caller then falls back
+    to the LLM supervisor. Every decision, including the fallback, is recorded with ``record``.
+    """
+
+    def __init__(self, tiers, min_confidence: float = 0.8):
+        self.tiers = list(tiers)
+        self.min_confidence = min_confidence
+        self.stats = {}
+
+    async def route(self, messages, config=None) -> Optional[RouteDecision]:
+        for tier in self.tiers:
+            started = time.perf_counter()
+            decision = await tier.route(messages, config)
+            if decision is not None and decision.confidence >= self.min_confidence:
+                self.record(decision, time.perf_counter() - started)
+                return decision
+        return None
+
+    def record(self, decision: RouteDecision, seconds: float):
+        totals = self.stats.setdefault(decision.tier, {"decisions": 0, "seconds": 0.0, "routes": {}})
+        totals["decisions"] += 1
+        totals["seconds"] += seconds
+        route = "fan_out" if decision.fan_out else decision.next
+        totals["routes"][route] = totals["routes"].get(route, 0) + 1
+
+    def get_stats(self) -> dict:
+        tiers = {tier: {**totals, "avg_seconds": round(totals["seconds"] / totals["decisions"], 4)} for tier, totals in self.stats.items()}
+        llm = self.stats.get("llm")
+        saved = sum(totals["decisions"] for tier, totals in self.stats.items() if tier != "llm")
+        avg_llm = llm["seconds"] / llm["decisions"] if llm else 0.0
+        fast_seconds = sum(totals["seconds"] for tier, totals in self.stats.items() if tier != "llm")
+        return {
+            "tiers": tiers,
+            "supervisor_calls_saved": saved,
+            # Estimated from the average latency of the LLM decisions observed so far
+            "estimated_seconds_saved": round(max(0.0, saved * avg_llm - fast_seconds), 3),
+        }
+
+
+def build_router(small_llm=None, system_prompt: str = "") -> RoutingLayer:
+    """Routing tiers configured by ROUTER_RULES and ROUTER_MIN_CONFIDENCE; the small-model tier is used when ``small_llm`` is given."""
+    tiers = []
+    if os.environ.get("ROUTER_RULES", "on").lower() not in ("off", "0", "false"):
+        tiers.append(RuleRouter())
+    if small_llm is not None:
+        tiers.append(SmallModelRouter(small_llm, system_prompt))
+    return RoutingLayer(tiers, min_confidence=float(os.environ.get("ROUTER_MIN_CONFIDENCE", "0.8")))
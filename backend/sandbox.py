@@ -0,0 +1,369 @@
+# backend/sandbox.py
+# Pool of pre-warmed Python worker processes that run untrusted snippets. Running this file starts one
+# worker, which reads one JSON job per line on stdin and answers with one JSON line on stdout. The worker
+# never runs a snippet itself: it forks a fresh child per job, so every job starts from clean module
+# state and can neither write to the result channel nor change what the next job sees.
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import select
+import tempfile
+import threading
+import subprocess
+
+logger = logging.getLogger("brainchain")
+
+WORKER_PATH = os.path.abspath(__file__)
+MAX_OUTPUT_CHARS = 64 * 1024
+MAX_FILE_BYTES = 16 * 1024 * 1024
+CLONE_NEWNET = 0x40000000
+# Imported by each worker before it forks jobs, so snippets get them without an import cost
+PRELOAD_MODULES = ("math", "cmath", "statistics", "decimal", "fractions", "random", "itertools", "functools", "collections",
+                   "heapq", "bisect", "re", "string", "json", "datetime", "calendar", "textwrap", "traceback", "io", "resource")
+
+# Messages for the ways a job can be stopped, keyed by the worker's "error" field
+JOB_ERRORS = {
+    "timeout": "Execution exceeded the wall-clock limit of {timeout:g} seconds",
+    "cpu": "Execution exceeded the CPU time limit of {cpu:g} seconds",
+    "killed": "The snippet was killed, most likely for exceeding its memory limit",
+}
+
+
+class SandboxError(Exception):
+    """The snippet could not be run to completion: it hit a time or memory limit, or its worker failed."""
+
+
+class _Worker:
+    def __init__(self, memory_mb: int, cpu_seconds: float, timeout_seconds: float, user: str):
+        self.jobs = 0
+        config = {"memory_mb": memory_mb, "cpu_seconds": cpu_seconds, "timeout_seconds": timeout_seconds, "user": user}
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", WORKER_PATH, json.dumps(config)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            # No API keys or proxies from the server environment
+            env={"PATH": os.environ.get("PATH", ""), "PYTHONDONTWRITEBYTECODE": "1", "OPENBLAS_NUM_THREADS": "1", "OMP_NUM_THREADS": "1"},
+            start_new_session=True,
+            text=True,
+        )
+        self.info = self._read(10)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read(self, timeout: float) -> dict:
+        # Any failure to read a well-formed result leaves the channel in an unknown state, so the worker is discarded
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            self.kill()
+            raise SandboxError("The sandbox worker stopped responding")
+        line = self.process.stdout.readline()
+        if not line:
+            self.kill()
+            raise SandboxError("The sandbox worker exited unexpectedly")
+        try:
+            message = json.loads(line)
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            self.kill()
+            raise SandboxError("The sandbox worker sent a malformed result")
+        return message
+
+    def run(self, code: str, timeout: float) -> dict:
+        self.jobs += 1
+        try:
+            self.process.stdin.write(json.dumps({"code": code}) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            self.kill()
+            raise SandboxError("The sandbox worker exited before the job started")
+        # The worker enforces the limits itself; the margin only catches a worker that hangs
+        return self._read(timeout + 5)
+
+    def kill(self):
+        if self.alive():
+            self.process.kill()
+        self.process.wait()
+
+
+class SandboxPool:
+    """Runs Python snippets on ``size`` pre-warmed worker processes.
+
+    Each job runs in a fresh process forked by a worker, limited to ``memory_mb`` of address space,
+    ``cpu_seconds`` of CPU time and ``timeout_seconds`` of wall-clock time, with no child processes or
+    threads. When the backend runs as root, jobs run as ``user`` (default ``nobody``), so they cannot read
+    the server's files or its environment, and the workers try to move into a network namespace of their
+    own, which needs CAP_SYS_ADMIN. ``get_stats()`` reports which of these are in effect; without them,
+    network access is only blocked at the Python level and is not a security boundary. Workers are
+    replaced after ``max_jobs_per_worker`` jobs, or when they fail. The pool starts lazily in each
+    process, so it can be created before a pre-fork server forks its workers.
+    """
+
+    def __init__(self, size: int = 2, memory_mb: int = 256, cpu_seconds: float = 5, timeout_seconds: float = 10,
+                 max_jobs_per_worker: int = 100, user: str = "nobody"):
+        self.size = size
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.user = user
+        self.stats = {"runs": 0, "errors": 0, "timeouts": 0, "killed": 0, "restarts": 0, "seconds": 0.0}
+        self.isolation = {}
+        self._idle = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self.memory_mb, self.cpu_seconds, self.timeout_seconds, self.user)
+        self.isolation = {key: worker.info.get(key) for key in ("sandbox_uid", "network_isolated")}
+        return worker
+
+    def warm(self):
+        """Start the workers now rather than on the first job."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._idle = queue.Queue()
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+            self._pid = os.getpid()
+        if self.isolation.get("sandbox_uid") is None or not self.isolation.get("network_isolated"):
+            logger.warning("Local sandbox isolation is incomplete (%s); do not run untrusted code with CODE_EXECUTOR=local", self.isolation)
+
+    def run(self, code: str) -> dict:
+        """Run ``code`` and return its ``stdout``, ``stderr``, ``exit_code`` and ``seconds``. Raises ``SandboxError``."""
+        self.warm()
+        worker = self._idle.get()
+        started = time.perf_counter()
+        try:
+            result = worker.run(code, self.timeout_seconds)
+        except SandboxError:
+            self._count("killed")
+            raise
+        finally:
+            if not worker.alive() or worker.jobs >= self.max_jobs_per_worker:
+                worker.kill()
+                try:
+                    worker = self._spawn()
+                    self._count("restarts")
+                except SandboxError:
+                    worker = None
+            if worker is not None:
+                self._idle.put(worker)
+            else:
+                # Keep the pool at full size even if a replacement failed to start; the next job retries it
+                self._idle.put(_DeadWorker())
+            self._count("runs")
+            self._count("seconds", time.perf_counter() - started)
+        error = result.get("error")
+        if error:
+            self._count("timeouts" if error == "timeout" else "killed")
+            raise SandboxError(JOB_ERRORS.get(error, "The snippet was stopped").format(timeout=self.timeout_seconds, cpu=self.cpu_seconds))
+        if result["exit_code"]:
+            self._count("errors")
+        return {**result, "seconds": round(time.perf_counter() - started, 4)}
+
+    def _count(self, key: str, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def close(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            while not self._idle.empty():
+                self._idle.get_nowait().kill()
+            self._pid = None
+
+    def get_stats(self) -> dict:
+        runs = self.stats["runs"]
+        return {
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()},
+            "avg_seconds": round(self.stats["seconds"] / runs, 4) if runs else None,
+            "workers": self.size,
+            **self.isolation,
+        }
+
+
+class _DeadWorker:
+    """Placeholder for a worker that failed to restart: it fails its job, and is then replaced."""
+
+    jobs = 0
+
+    def alive(self) -> bool:
+        return False
+
+    def run(self, code: str, timeout: float) -> dict:
+        raise SandboxError("The sandbox worker could not be started")
+
+    def kill(self):
+        pass
+
+
+def _isolate_network() -> bool:
+    """Move this process into an empty network namespace; every job forked afterwards inherits it."""
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.unshare(CLONE_NEWNET) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _sandbox_ids(user: str):
+    """uid and gid jobs run as; None when the worker cannot switch users (it is not root) or ``user`` is empty."""
+    if not user or os.getuid() != 0:
+        return None, None
+    import pwd
+    entry = pwd.getpwnam(user)
+    return entry.pw_uid, entry.pw_gid
+
+
+def _disable_network():
+    # Fallback when the worker has no network namespace of its own; C extensions can still open sockets
+    import socket
+
+    def blocked(*args, **kwargs):
+        raise OSError("Network access is disabled in the local sandbox")
+
+    class BlockedSocket(socket.socket):
+        def __init__(self, *args, **kwargs):
+            blocked()
+
+    socket.socket = BlockedSocket
+    socket.create_connection = blocked
+    socket.getaddrinfo = blocked
+    socket.socketpair = blocked
+
+
+def _child(code: str, config: dict, out_fd: int, err_fd: int, workdir: str, uid, gid, network_isolated: bool):
+    """Runs in the forked job process and never returns."""
+    import io
+    import resource
+    import traceback
+
+    null = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(null, 0)
+    os.dup2(out_fd, 1)
+    os.dup2(err_fd, 2)
+    # Closes the result channel and the job stream, so the snippet cannot forge or read results
+    os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+    os.chdir(workdir)
+    if uid is not None:
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+    memory = config["memory_mb"] * 1024 * 1024
+    cpu = max(1, int(config["cpu_seconds"] + 0.999))
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (MAX_FILE_BYTES, MAX_FILE_BYTES))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if not network_isolated:
+        _disable_network()
+    sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), line_buffering=True)
+    sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), line_buffering=True)
+    exit_code = 0
+    try:
+        exec(compile(code, "<code>", "exec"), {"__name__": "__main__"})
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        # Leave this file's frame out of the traceback, so it reads like running the snippet directly
+        error_type, error, tb = sys.exc_info()
+        traceback.print_exception(error_type, error, tb.tb_next)
+        exit_code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(exit_code & 0xFF)
+
+
+def _wait(pid: int, timeout: float):
+    """Wait status of ``pid``, or None if it is still running after ``timeout`` seconds."""
+    deadline = time.monotonic() + timeout
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    try:
+        while True:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                return status
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            if pidfd is not None:
+                select.select([pidfd], [], [], remaining)
+            else:
+                time.sleep(min(0.005, remaining))
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+def _read_output(file) -> str:
+    file.seek(0)
+    return file.read(MAX_OUTPUT_CHARS * 4).decode("utf-8", errors="replace")[:MAX_OUTPUT_CHARS]
+
+
+def _run_job(code: str, config: dict, uid, gid, network_isolated: bool) -> dict:
+    import shutil
+    import signal
+
+    workdir = tempfile.mkdtemp(prefix="brainchain-job-")
+    if uid is not None:
+        os.chown(workdir, uid, gid)
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _child(code, config, out.fileno(), err.fileno(), workdir, uid, gid, network_isolated)
+            finally:
+                os._exit(70)
+        status = _wait(pid, config["timeout_seconds"])
+        error = None
+        if status is None:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            error = "timeout"
+        elif os.WIFSIGNALED(status):
+            error = "cpu" if os.WTERMSIG(status) in (signal.SIGXCPU, signal.SIGKILL) else "killed"
+        result = {
+            "stdout": _read_output(out),
+            "stderr": _read_output(err),
+            "exit_code": os.WEXITSTATUS(status) if status is not None and os.WIFEXITED(status) else -1,
+            "error": error,
+        }
+    shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def _serve(config: dict):
+    # The result channel is a private copy of fd 1; fd 1 itself is pointed at /dev/null, so nothing
+    # else written to it can reach the pool
+    channel = os.fdopen(os.dup(1), "w")
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    network_isolated = _isolate_network()
+    uid, gid = _sandbox_ids(config["user"])
+    for module in PRELOAD_MODULES:
+        __import__(module)
+    channel.write(json.dumps({"ready": True, "sandbox_uid": uid, "network_isolated": network_isolated}) + "\n")
+    channel.flush()
+    for line in sys.stdin:
+        job = json.loads(line)
+        channel.write(json.dumps(_run_job(job["code"], config, uid, gid, network_isolated)) + "\n")
+        channel.flush()
+
+
+if __name__ == "__main__":
+    _serve(json.loads(sys.argv[1]))
@@ -0,0 +1,132 @@
+# backend/speculation.py
+import os
+import time
+import uuid
+import asyncio
+from typing import Optional
+
+SPECULATION_ENABLED = os.environ.get("SPECULATION", "off").lower() in ("on", "1", "true")
+
+
+def speculation_context(messages) -> str:
+    """What the routing decision depends on most: the agent that spoke last in the current turn ("question" for a new one)."""
+    name = getattr(messages[-1], "name", None) if messages else None
+    return name or "question"
+
+
+def worker_config(config, node: str) -> dict:
+    """The supervisor's run config, relabelled as a run of ``node``. Streamed tokens and traced LLM and tool
+    calls are attributed by the node in the metadata and checkpoint namespace, which would otherwise name the supervisor.
+    ``speculative`` in the metadata marks the run, so its tokens are not streamed before the supervisor has agreed."""
+    config = config or {}
+    namespace = f"{node}:{uuid.uuid4()}"
+    return {
+        **config,
+        "metadata": {**config.get("metadata", {}), "langgraph_node": node, "langgraph_checkpoint_ns": namespace, "speculative": True},
+        "configurable": {**config.get("configurable", {}), "checkpoint_ns": namespace},
+    }
+
+
+class Speculation:
+    """A worker started ahead of the supervisor's decision, to be committed or discarded once it is known."""
+
+    def __init__(self, node: str, task: asyncio.Task):
+        self.node = node
+        self.task = task
+        self.started = time.perf_counter()
+
+    async def cancel(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except BaseException:
+            pass
+        return time.perf_counter() - self.started
+
+
+class Speculator:
+    """Starts the most likely next worker while the LLM supervisor is still deciding.
+
+    The routing frequencies of the LLM supervisor are recorded per context (the agent that spoke
+    last). Once a context has ``min_samples`` decisions and one worker was chosen at least
+    ``min_probability`` of the time, that worker is started alongside the supervisor call. Its
+    result is committed when the supervisor agrees and cancelled otherwise. Speculative spend is
+    capped by ``max_inflight`` runs at once in this worker and ``max_per_request`` per request.
+    """
+
+    def __init__(self, enabled: bool = False, min_probability: float = 0.6, min_samples: int = 20, max_inflight: int = 4, max_per_request: int = 1):
+        self.enabled = enabled
+        self.min_probability = min_probability
+        self.min_samples = min_samples
+        self.max_inflight = max_inflight
+        self.max_per_request = max_per_request
+        self.frequencies = {}
+        self.inflight = 0
+        self.stats = {"started": 0, "hits": 0, "misses": 0, "skipped_cap": 0, "seconds_saved": 0.0, "seconds_wasted": 0.0}
+
+    def observe(self, context: str, next_node: str):
+        counts = self.frequencies.setdefault(context, {})
+        counts[next_node] = counts.get(next_node, 0) + 1
+
+    def predict(self, context: str) -> Optional[str]:
+        counts = self.frequencies.get(context, {})
+        total = sum(counts.values())
+        if total < self.min_samples:
+            return None
+        node, count = max(counts.items(), key=lambda item: item[1])
+        return node if count / total >= self.min_probability else None
+
+    def start(self, messages, config, workers: dict) -> Optional[Speculation]:
+        """Start the predicted worker as a task, or return None when there is no confident prediction or the spend cap is reached."""
+        if not self.enabled:
+            return None
+        node = self.predict(speculation_context(messages))
+        if node not in workers:
+            return None
+        counter = (config or {}).get("configurable", {}).get("speculation")
+        if self.inflight >= self.max_inflight or (counter is not None and counter["started"] >= self.max_per_request):
+            self.stats["skipped_cap"] += 1
+            return None
+        if counter is not None:
+            counter["started"] += 1
+        self.inflight += 1
+        self.stats["started"] += 1
+        task = asyncio.create_task(workers[node]({"messages": list(messages)}, worker_config(config, node)))
+        task.add_done_callback(self._finished)
+        return Speculation(node, task)
+
+    def _finished(self, task):
+        self.inflight -= 1
+
+    async def commit(self, speculation: Speculation, decision_seconds: float):
+        """The supervisor agreed: wait for the speculative result. Saves up to the supervisor's own latency."""
+        result = await speculation.task
+        self.stats["hits"] += 1
+        self.stats["seconds_saved"] += min(decision_seconds, time.perf_counter() - speculation.started)
+        return result
+
+    async def discard(self, speculation: Speculation):
+        """The supervisor chose something else: cancel the speculative run and count what it cost."""
+        self.stats["misses"] += 1
+        self.stats["seconds_wasted"] += await speculation.cancel()
+
+    def get_stats(self) -> dict:
+        decided = self.stats["hits"] + self.stats["misses"]
+        return {
+            "enabled": self.enabled,
+            **{key: round(value, 3) if isinstance(value, float) else value for key, value in self.stats.items()},
+            "hit_rate": round(self.stats["hits"] / decided, 4) if decided else None,
+            "inflight": self.inflight,
+            "frequencies": self.frequencies,
+        }
+
+
+def build_speculator() -> Speculator:
+    """Speculator configured by SPECULATION and the SPECULATION_* limits."""
+    return Speculator(
+        enabled=SPECULATION_ENABLED,
+        min_probability=float(os.environ.get("SPECULATION_MIN_PROBABILITY", "0.6")),
+        min_samples=int(os.environ.get("SPECULATION_MIN_SAMPLES", "20")),
+        max_inflight=int(os.environ.get("SPECULATION_MAX_INFLIGHT", "4")),
+        max_per_request=int(os.environ.get("SPECULATION_MAX_PER_REQUEST", "1")),
+    )
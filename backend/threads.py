@@ -0,0 +1,131 @@
+# backend/threads.py
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from contextlib import asynccontextmanager
+from cache import connect_sqlite
+
+logger = logging.getLogger("brainchain")
+
+CHECKPOINTER = os.environ.get("CHECKPOINTER", "sqlite").lower()
+CHECKPOINT_PATH = os.environ.get("CHECKPOINT_PATH", "threads.db")
+THREAD_TTL_SECONDS = float(os.environ.get("THREAD_TTL_SECONDS", "86400"))
+THREAD_MAX = int(os.environ.get("THREAD_MAX", "1000"))
+THREAD_EVICT_INTERVAL_SECONDS = float(os.environ.get("THREAD_EVICT_INTERVAL_SECONDS", "300"))
+
+
+@asynccontextmanager
+async def open_checkpointer():
+    """Yield the checkpointer selected by CHECKPOINTER (``sqlite``, ``memory`` or ``off``), or None when off."""
+    if CHECKPOINTER in ("", "off", "none"):
+        yield None
+    elif CHECKPOINTER == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+        yield MemorySaver()
+    elif CHECKPOINTER == "sqlite":
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        async with AsyncSqliteSaver.from_conn_string(CHECKPOINT_PATH) as saver:
+            yield saver
+    else:
+        raise ValueError(f"Unknown CHECKPOINTER '{CHECKPOINTER}'. Use 'sqlite', 'memory' or 'off'.")
+
+
+class ThreadRegistry:
+    """Tracks when each conversation thread was last used and deletes idle or excess threads from the checkpointer.
+
+    Threads idle for longer than ``ttl_seconds`` are evicted, and beyond ``max_threads`` the least
+    recently used go first. Last use is kept in a SQLite table at ``path`` - the checkpoint file when
+    the checkpointer is SQLite - so every worker process sees every thread and evicts by the same clock.
+    Threads checkpointed before a restart count as used when the registry first loads them.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl_seconds: float = THREAD_TTL_SECONDS, max_threads: int = THREAD_MAX):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._conn_pid = None
+        self._connection = None
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._conn_pid != os.getpid():
+            self._connection = connect_sqlite(self.path)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS thread_usage (thread_id TEXT PRIMARY KEY, last_used REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS thread_usage_last_used ON thread_usage (last_used)")
+            self._conn_pid = os.getpid()
+        return self._connection
+
+    def touch(self, thread_id: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO thread_usage (thread_id, last_used) VALUES (?, ?) ON CONFLICT (thread_id) DO UPDATE SET last_used = excluded.last_used",
+                (thread_id, time.time()),
+            )
+
+    def forget(self, thread_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM thread_usage WHERE thread_id = ?", (thread_id,))
+
+    async def load(self, checkpointer):
+        """Register threads that already have checkpoints but no recorded use, e.g. from before a restart."""
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'checkpoints'").fetchone():
+                # The checkpointer shares this file: one statement, instead of every worker scanning every checkpoint
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO thread_usage (thread_id, last_used) SELECT DISTINCT thread_id, ? FROM checkpoints", (time.time(),)
+                )
+                return
+        known = set()
+        async for checkpoint in checkpointer.alist(None):
+            thread_id = checkpoint.config["configurable"]["thread_id"]
+            if thread_id not in known:
+                known.add(thread_id)
+                with self._lock:
+                    self._conn.execute("INSERT OR IGNORE INTO thread_usage (thread_id, last_used) VALUES (?, ?)", (thread_id, time.time()))
+
+    def _claim_expired(self) -> list:
+        """Remove the usage rows of threads to evict and return their ids. A row is only removed if it was
+        not touched since it was selected, so a thread used meanwhile by another worker is kept."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = self._conn.execute("SELECT thread_id, last_used FROM thread_usage WHERE last_used < ?", (cutoff,)).fetchall()
+            total = self._conn.execute("SELECT COUNT(*) FROM thread_usage").fetchone()[0]
+            excess = total - len(expired) - self.max_threads
+            if excess > 0:
+                expired += self._conn.execute(
+                    "SELECT thread_id, last_used FROM thread_usage WHERE last_used >= ? ORDER BY last_used LIMIT ?", (cutoff, excess)
+                ).fetchall()
+            claimed = []
+            for thread_id, last_used in expired:
+                deleted = self._conn.execute("DELETE FROM thread_usage WHERE thread_id = ? AND last_used = ?", (thread_id, last_used)).rowcount
+                if deleted:
+                    claimed.append(thread_id)
+        return claimed
+
+    async def evict(self, checkpointer) -> int:
+        expired = await asyncio.to_thread(self._claim_expired)
+        for thread_id in expired:
+            await checkpointer.adelete_thread(thread_id)
+        self.evicted += len(expired)
+        if expired:
+            logger.info("Evicted %d conversation threads", len(expired))
+        return len(expired)
+
+    async def evict_forever(self, checkpointer, interval: float = THREAD_EVICT_INTERVAL_SECONDS):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict(checkpointer)
+            except Exception:
+                logger.exception("Thread eviction failed")
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            threads = self._conn.execute("SELECT COUNT(*) FROM thread_usage").fetchone()[0]
+        # "evicted" counts this worker's evictions only
+        return {"threads": threads, "evicted": self.evicted, "ttl_seconds": self.ttl_seconds, "max_threads": self.max_threads}
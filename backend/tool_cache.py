@@ -0,0 +1,206 @@
+# backend/tool_cache.py
+import re
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from pydantic import PrivateAttr
+from langchain_core.rate_limiters import BaseRateLimiter
+from langchain_core.tools import BaseTool
+
+def normalize_args(args: dict) -> str:
+    """Default cache key: the arguments as sorted JSON with runs of whitespace collapsed in string values."""
+    cleaned = {k: re.sub(r"\s+", " ", v).strip() if isinstance(v, str) else v for k, v in args.items()}
+    return json.dumps(cleaned, sort_keys=True, default=str)
+
+
+def normalize_search_args(args: dict) -> str:
+    """Search queries are case-insensitive, so they are lowercased as well."""
+    return normalize_args({k: v.lower() if isinstance(v, str) else v for k, v in args.items()})
+
+
+def normalize_code_args(args: dict) -> str:
+    """Code is case- and indentation-sensitive; only trailing whitespace and blank edge lines are ignored."""
+    cleaned = {}
+    for k, v in args.items():
+        if isinstance(v, str):
+            v = "\n".join(line.rstrip() for line in v.strip("\n").splitlines())
+        cleaned[k] = v
+    return json.dumps(cleaned, sort_keys=True, default=str)
+
+
+class _LeaderCancelled(Exception):
+    """The call that coalesced followers were waiting for was cancelled before it finished."""
+
+
+class CachedTool(BaseTool):
+    """Wraps a LangChain tool with a TTL result cache and single-flight deduplication.
+
+    The wrapper exposes the wrapped tool's name, description and argument schema, so agents see the
+    same tool. Identical calls (after ``normalize``) made while one is already running wait for that
+    call instead of issuing their own. Results for which ``cacheable`` returns False, and calls that
+    raise, are never stored. Tool errors count as raising: the wrapper takes over the wrapped tool's
+    ``handle_tool_error``, so the error reaches the agent as before but is not cached as a result.
+    An optional ``rate_limiter`` is applied to real calls only, never to cache hits.
+    ``on_result`` is called with the arguments and result of every real call whose result is cacheable.
+    """
+
+    tool: BaseTool
+    ttl_seconds: Optional[float] = 3600
+    max_entries: int = 512
+    normalize: Callable[[dict], str] = normalize_args
+    cacheable: Callable[[Any], bool] = lambda result: True
+    rate_limiter: Optional[BaseRateLimiter] = None
+    on_result: Optional[Callable[[dict, Any], None]] = None
+
+    _cache: OrderedDict = PrivateAttr(default_factory=OrderedDict)
+    _inflight: dict = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _stats: dict = PrivateAttr(default_factory=lambda: {
+        "calls": 0, "hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "latency_seconds": 0.0,
+    })
+
+    def __init__(self, tool: BaseTool, **kwargs):
+        kwargs.setdefault("handle_tool_error", tool.handle_tool_error)
+        tool.handle_tool_error = False  # Raise ToolException instead of returning its message as the result
+        super().__init__(tool=tool, name=tool.name, description=tool.description, args_schema=tool.args_schema, **kwargs)
+
+    def _lookup(self, key: str):
+        item = self._cache.get(key)
+        if item is None:
+            return False, None
+        stored_at, result = item
+        if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, result
+
+    def _store(self, key: str, result):
+        if not self.cacheable(result):
+            return
+        self._cache[key] = (time.monotonic(), result)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _notify(self, args: dict, result):
+        if self.on_result is not None and self.cacheable(result):
+            self.on_result(args, result)
+
+    def _record_call(self, started: float, failed: bool):
+        self._stats["latency_seconds"] += time.perf_counter() - started
+        if failed:
+            self._stats["errors"] += 1
+
+    def _run(self, **kwargs):
+        key = self.normalize(kwargs)
+        with self._lock:
+            self._stats["calls"] += 1
+            found, result = self._lookup(key)
+            if found:
+                self._stats["hits"] += 1
+                return result
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                waiter = self._inflight[key] = {"done": threading.Event()}
+                leader = True
+                self._stats["misses"] += 1
+            else:
+                leader = False
+                self._stats["coalesced"] += 1
+        if not leader:
+            waiter["done"].wait()
+            if "error" in waiter:
+                raise waiter["error"]
+            return waiter["result"]
+
+        started = time.perf_counter()
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            result = self.tool.invoke(kwargs)
+        except Exception as e:
+            waiter["error"] = e
+            raise
+        else:
+            waiter["result"] = result
+            with self._lock:
+                self._store(key, result)
+            self._notify(kwargs, result)
+            return result
+        finally:
+            with self._lock:
+                self._record_call(started, "result" not in waiter)
+                self._inflight.pop(key, None)
+            waiter["done"].set()
+
+    async def _arun(self, **kwargs):
+        key = self.normalize(kwargs)
+        with self._lock:
+            self._stats["calls"] += 1
+        while True:
+            with self._lock:
+                found, result = self._lookup(key)
+                if found:
+                    self._stats["hits"] += 1
+                    return result
+                future = self._inflight.get(("async", key))
+                if future is None:
+                    future = self._inflight[("async", key)] = asyncio.get_running_loop().create_future()
+                    leader = True
+                    self._stats["misses"] += 1
+                else:
+                    leader = False
+                    self._stats["coalesced"] += 1
+            if leader:
+                break
+            try:
+                # shield() so a cancelled follower does not cancel the shared call
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # The caller making the call was cancelled; the first follower to get here makes it instead
+                continue
+
+        started = time.perf_counter()
+        failed = True
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire()
+            result = await self.tool.ainvoke(kwargs)
+            failed = False
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel every follower too; tell them to retry instead
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case no follower was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            with self._lock:
+                self._store(key, result)
+            await asyncio.to_thread(self._notify, kwargs, result)
+            return result
+        finally:
+            with self._lock:
+                self._record_call(started, failed)
+                self._inflight.pop(("async", key), None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._cache)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["coalesced"]) / lookups, 4) if lookups else 0.0
+        stats["avg_latency_seconds"] = round(stats["latency_seconds"] / stats["misses"], 4) if stats["misses"] else 0.0
+        stats["latency_seconds"] = round(stats["latency_seconds"], 4)
+        return stats
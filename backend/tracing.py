@@ -0,0 +1,164 @@
+# backend/tracing.py
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+from metrics import REGISTRY
+
+logger = logging.getLogger("brainchain")
+
+WORKFLOW_NODES = ("supervisor", "enhancer", "researcher", "coder", "validator")
+
+# Optional sink: one JSON line per finished request
+TRACE_JSONL_PATH = os.environ.get("TRACE_JSONL_PATH")
+_sink_lock = threading.Lock()
+
+REQUEST_LATENCY = REGISTRY.histogram("brainchain_request_seconds", "End-to-end workflow latency.", ["status"])
+NODE_LATENCY = REGISTRY.histogram("brainchain_node_seconds", "Latency of one visit to a workflow node.", ["node"])
+LLM_LATENCY = REGISTRY.histogram("brainchain_llm_call_seconds", "Latency of one LLM call, by the node that made it.", ["node"])
+TOOL_LATENCY = REGISTRY.histogram("brainchain_tool_call_seconds", "Latency of one tool call.", ["tool"])
+LLM_TOKENS = REGISTRY.counter("brainchain_llm_tokens_total", "Tokens reported by the LLM.", ["node", "kind"])
+LLM_RETRIES = REGISTRY.counter("brainchain_llm_retries_total", "LLM call retries.", ["node"])
+ROUTES = REGISTRY.counter("brainchain_routing_decisions_total", "Supervisor routing decisions.", ["tier", "next"])
+VERDICTS = REGISTRY.counter("brainchain_validator_verdicts_total", "Validator verdicts.", ["tier", "next"])
+ADMISSIONS = REGISTRY.counter("brainchain_admissions_total", "Workflow admission outcomes: admitted, rejected (queue full), timed_out and shed.", ["priority", "outcome"])
+ADMISSION_WAIT = REGISTRY.histogram("brainchain_admission_wait_seconds", "Time an admitted request waited for a workflow slot.", ["priority"])
+SPECULATIONS = REGISTRY.counter("brainchain_speculations_total", "Workers started ahead of the supervisor decision, by outcome.", ["worker", "outcome"])
+
+
+def _node_of(metadata) -> str:
+    # The namespace root is the outer workflow node even for runs nested inside a ReAct agent
+    return (metadata or {}).get("langgraph_checkpoint_ns", "").split(":")[0] or "workflow"
+
+
+class Trace(BaseCallbackHandler):
+    """Collects the spans of one workflow request.
+
+    Attached to the run config as a callback, it opens a span for every workflow node visit, LLM call
+    and tool call (including those made inside the ReAct agents), and feeds their latencies into the
+    Prometheus histograms. Nodes add their own facts, such as routing decisions, with ``event``.
+    """
+
+    run_inline = True
+
+    def __init__(self, query: str = ""):
+        self.trace_id = uuid.uuid4().hex
+        self.query = query
+        self.started = time.perf_counter()
+        self.spans = []
+        self._open = {}
+
+    def _start(self, run_id, kind: str, name: str, node: str):
+        span = {"kind": kind, "name": name, "node": node, "start": round(time.perf_counter() - self.started, 6), "retries": 0}
+        self._open[run_id] = span
+        return span
+
+    def _end(self, run_id, error=None):
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return None
+        span["seconds"] = round(time.perf_counter() - self.started - span["start"], 6)
+        if error is not None:
+            span["error"] = repr(error)
+        self.spans.append(span)
+        return span
+
+    # Workflow node visits
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        namespace = (metadata or {}).get("langgraph_checkpoint_ns", "")
+        if name in WORKFLOW_NODES and "|" not in namespace and (metadata or {}).get("langgraph_node") == name:
+            self._start(run_id, "node", name, name)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        span = self._end(run_id)
+        if span is not None:
+            NODE_LATENCY.observe(span["seconds"], node=span["node"])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        span = self._end(run_id, error)
+        if span is not None:
+            NODE_LATENCY.observe(span["seconds"], node=span["node"])
+
+    # LLM calls
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        name = (serialized or {}).get("kwargs", {}).get("model_name") or (serialized or {}).get("name", "llm")
+        self._start(run_id, "llm", name, _node_of(metadata))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._end(run_id)
+        if span is None:
+            return
+        prompt_tokens = completion_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        span["prompt_tokens"] = prompt_tokens
+        span["completion_tokens"] = completion_tokens
+        LLM_LATENCY.observe(span["seconds"], node=span["node"])
+        LLM_TOKENS.inc(prompt_tokens, node=span["node"], kind="prompt")
+        LLM_TOKENS.inc(completion_tokens, node=span["node"], kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self._end(run_id, error)
+        if span is not None:
+            LLM_LATENCY.observe(span["seconds"], node=span["node"])
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        span = self._open.get(run_id)
+        if span is not None:
+            span["retries"] += 1
+            LLM_RETRIES.inc(node=span["node"])
+
+    # Tool calls
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, name=None, **kwargs):
+        self._start(run_id, "tool", name or (serialized or {}).get("name", "tool"), _node_of(metadata))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        span = self._end(run_id)
+        if span is not None:
+            TOOL_LATENCY.observe(span["seconds"], tool=span["name"])
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        span = self._end(run_id, error)
+        if span is not None:
+            TOOL_LATENCY.observe(span["seconds"], tool=span["name"])
+
+    def event(self, name: str, node: str, **attributes):
+        """Record a point-in-time fact, e.g. a routing decision, against the current request."""
+        self.spans.append({"kind": "event", "name": name, "node": node, "start": round(time.perf_counter() - self.started, 6), **attributes})
+
+    def finish(self, status: str = "ok", **attributes) -> dict:
+        seconds = time.perf_counter() - self.started
+        REQUEST_LATENCY.observe(seconds, status=status)
+        record = {
+            "trace_id": self.trace_id,
+            "query": self.query,
+            "status": status,
+            "seconds": round(seconds, 6),
+            **attributes,
+            "spans": sorted(self.spans, key=lambda span: span["start"]),
+        }
+        nodes = [span["name"] for span in record["spans"] if span["kind"] == "node"]
+        logger.info("trace %s %s in %.2fs: %s", self.trace_id, status, seconds, " -> ".join(nodes))
+        if TRACE_JSONL_PATH:
+            with _sink_lock, open(TRACE_JSONL_PATH, "a", encoding="utf-8") as sink:
+                sink.write(json.dumps(record, default=str) + "\n")
+        return record
+
+
+def trace_event(config, name: str, node: str, **attributes) -> None:
+    """Add an event to the request's trace, if the run is being traced."""
+    trace = (config or {}).get("configurable", {}).get("trace")
+    if trace is not None:
+        trace.event(name, node, **attributes)
+    if name == "route":
+        ROUTES.inc(tier=attributes.get("tier", ""), next=attributes.get("next", ""))
+    elif name == "validate":
+        VERDICTS.inc(tier=attributes.get("tier", ""), next=attributes.get("next", ""))
+    elif name == "speculate":
+        SPECULATIONS.inc(worker=attributes.get("worker", ""), outcome=attributes.get("outcome", ""))
@@ -0,0 +1,163 @@
+# backend/validation.py
+import os
+import re
+import random
+from typing import Literal, Optional
+from pydantic import BaseModel
+from langchain_core.messages import ToolMessage
+
+# Define a validation verdict and the tier that reached it
+class Verdict(BaseModel):
+    next: Literal["supervisor", "FINISH"]
+    reason: str
+    tier: str = "llm"
+    confidence: float = 1.0
+
+
+# Failure text from the tools (Riza reports a non-zero exit code, Tavily a repr() of the error) or from the agent giving up
+ERROR_MARKERS = re.compile(
+    r"(traceback \(most recent call last\)|non-zero exit code|\b\w*error:|\bexception:|"
+    r"\bi (?:was|am) unable to\b|\bi (?:can(?:not|'t)|could not|couldn't) (?:find|access|execute|run|complete)\b)",
+    re.IGNORECASE,
+)
+# Refusals and hedges: an answer that declines or qualifies itself can mention every key term and still not answer
+REFUSAL_MARKERS = re.compile(
+    r"(\b(?:do not|don't|does not|doesn't) have (?:access|real-time|up-to-date|current)\b|\bi (?:cannot|can't|can not)\b|"
+    r"\bcannot (?:tell|provide|give|access|browse|determine|predict|confirm)\b|\bas of my (?:last )?(?:knowledge|training)\b|"
+    r"\b(?:knowledge|training) cut-?off\b|\bi (?:do not|don't) know\b|\bi'?m not (?:sure|able)\b|\bi am not (?:sure|able)\b|"
+    r"\bi'?m sorry\b|\bi apologi[sz]e\b)",
+    re.IGNORECASE,
+)
+STOPWORDS = frozenset(
+    "a an the and or of to in on for by with from at as is are was were be been it its this that these those "
+    "what which who whom whose when where why how do does did can could should would will shall may might "
+    "me my i you your we our they their please tell give show find get about into than then there here "
+    "calculate compute write explain describe".split()
+)
+TERM = re.compile(r"[A-Za-z][A-Za-z0-9'\-]*|\d+(?:[.,]\d+)*")
+
+
+def key_terms(question: str):
+    """Entities and content words of the question: capitalized names, numbers and words that are not stopwords."""
+    terms = []
+    for term in TERM.findall(question):
+        lowered = term.lower()
+        if lowered in STOPWORDS or (len(term) < 3 and not term[0].isdigit()):
+            continue
+        if lowered not in terms:
+            terms.append(lowered)
+    return terms
+
+
+def tool_report(messages) -> dict:
+    """Tool calls made inside a ReAct agent run and how many of them failed."""
+    results = [m for m in messages if isinstance(m, ToolMessage)]
+    errors = sum(1 for m in results if getattr(m, "status", "success") == "error" or ERROR_MARKERS.search(str(m.content)[:500]))
+    return {"calls": len(results), "errors": errors}
+
+
+class RuleValidator:
+    """Deterministic tier: accepts answers that are clearly complete and rejects ones that are clearly broken.
+
+    The confidence of an acceptance grows with the share of the question's key terms the answer
+    mentions and drops for short answers, failed tool calls, error text and refusals or hedges. Returns None when the
+    answer is neither, leaving the verdict to the next tier.
+    """
+
+    tier = "rules"
+
+    def __init__(self, min_answer_chars: int = 20):
+        self.min_answer_chars = min_answer_chars
+
+    async def validate(self, question: str, answer: Optional[str], outputs=(), config=None) -> Optional[Verdict]:
+        answer = (answer or "").strip()
+        if not answer:
+            return Verdict(next="supervisor", reason="The workers returned an empty answer.", tier=self.tier, confidence=0.95)
+        reports = [output.additional_kwargs.get("tools") or {} for output in outputs]
+        tool_calls = sum(report.get("calls", 0) for report in reports)
+        tool_errors = sum(report.get("errors", 0) for report in reports)
+        failed = bool(ERROR_MARKERS.search(answer))
+        refused = bool(REFUSAL_MARKERS.search(answer))
+        if failed and tool_calls and tool_errors == tool_calls:
+            return Verdict(next="supervisor", reason="Every tool call failed and the answer reports the error.", tier=self.tier, confidence=0.9)
+        terms = key_terms(question)
+        lowered = answer.lower()
+        coverage = sum(1 for term in terms if term in lowered) / len(terms) if terms else 0.5
+        confidence = 0.5 + 0.4 * coverage
+        if tool_calls and not tool_errors:
+            confidence += 0.1
+        if tool_errors:
+            confidence -= 0.2
+        if failed or refused:
+            confidence -= 0.4
+        if len(answer) < self.min_answer_chars and not any(c.isdigit() for c in answer):
+            confidence -= 0.2
+        confidence = round(max(0.0, min(1.0, confidence)), 3)
+        return Verdict(
+            next="FINISH", tier=self.tier, confidence=confidence,
+            reason=f"The answer covers {coverage:.0%} of the question's key terms"
+            + (" but declines or hedges." if refused else " and the tool calls succeeded." if tool_calls and not tool_errors else "."),
+        )
+
+
+class ValidationLayer:
+    """Runs the cheap tiers in order and keeps the first verdict at or above ``min_confidence``.
+
+    ``validate`` returns None when every tier abstains or is unsure, and the caller then asks the LLM
+    validator. A ``shadow_rate`` share of the confident verdicts is also sent to the LLM; its verdict
+    is the one used, and whether the two agreed is recorded, so the accuracy given up for the saved
+    round trips can be measured.
+    """
+
+    def __init__(self, tiers, min_confidence: float = 0.85, shadow_rate: float = 0.0):
+        self.tiers = list(tiers)
+        self.min_confidence = min_confidence
+        self.shadow_rate = shadow_rate
+        self.stats = {}
+        self.shadow = {"checked": 0, "agreed": 0}
+
+    async def validate(self, question: str, answer: Optional[str], outputs=(), config=None) -> Optional[Verdict]:
+        for tier in self.tiers:
+            verdict = await tier.validate(question, answer, outputs, config)
+            if verdict is not None and verdict.confidence >= self.min_confidence:
+                return verdict
+        return None
+
+    def should_shadow(self) -> bool:
+        return self.shadow_rate > 0 and random.random() < self.shadow_rate
+
+    def record(self, verdict: Verdict, seconds: float, shadowed: Optional[Verdict] = None):
+        totals = self.stats.setdefault(verdict.tier, {"verdicts": 0, "seconds": 0.0, "next": {}})
+        totals["verdicts"] += 1
+        totals["seconds"] += seconds
+        totals["next"][verdict.next] = totals["next"].get(verdict.next, 0) + 1
+        if shadowed is not None:
+            self.shadow["checked"] += 1
+            self.shadow["agreed"] += shadowed.next == verdict.next
+
+    def get_stats(self) -> dict:
+        tiers = {tier: {**totals, "avg_seconds": round(totals["seconds"] / totals["verdicts"], 4)} for tier, totals in self.stats.items()}
+        llm = self.stats.get("llm")
+        saved = sum(totals["verdicts"] for tier, totals in self.stats.items() if tier != "llm")
+        avg_llm = llm["seconds"] / llm["verdicts"] if llm else 0.0
+        fast_seconds = sum(totals["seconds"] for tier, totals in self.stats.items() if tier != "llm")
+        checked = self.shadow["checked"]
+        return {
+            "tiers": tiers,
+            "validator_calls_saved": saved,
+            # Estimated from the average latency of the LLM verdicts observed so far
+            "estimated_seconds_saved": round(max(0.0, saved * avg_llm - fast_seconds), 3),
+            "shadow": {**self.shadow, "agreement": round(self.shadow["agreed"] / checked, 4) if checked else None},
+        }
+
+
+def build_validator() -> ValidationLayer:
+    """Validation tiers configured by VALIDATOR_RULES, VALIDATOR_MIN_CONFIDENCE and VALIDATOR_SHADOW_RATE."""
+    tiers = []
+    if os.environ.get("VALIDATOR_RULES", "on").lower() not in ("off", "0", "false"):
+        tiers.append(RuleValidator(min_answer_chars=int(os.environ.get("VALIDATOR_MIN_ANSWER_CHARS", "20"))))
+    return ValidationLayer(
+        tiers,
+        min_confidence=float(os.environ.get("VALIDATOR_MIN_CONFIDENCE", "0.85")),
+        shadow_rate=float(os.environ.get("VALIDATOR_SHADOW_RATE", "0.05")),
+    )
@@ -2,31 +2,80 @@
 
 # backend/workflow.py
 import os
+import time
+import asyncio
+import logging
+import threading
 from typing import Annotated, Sequence, List, Literal
 from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_community.tools.riza.command import ExecPython
 from langchain_groq import ChatGroq
 from langgraph.types import Command
 from langgraph.graph import StateGraph, START, END, MessagesState
 from langgraph.prebuilt import create_react_agent
+from ratelimit import provider_rate_limiter
+from llm_gateway import LLMGateway
+from tool_cache import CachedTool, normalize_code_args, normalize_search_args
+from local_exec import build_code_executor
+from knowledge import KnowledgeSearch, build_knowledge_store, index_search_results
+from compaction import best_answer, compact_for_node, compacting_prompt, conversation_digest, latest_worker_outputs, split_turns
+from routing import RouteDecision, build_router
+from validation import Verdict, build_validator, tool_report
+from speculation import build_speculator, speculation_context
+from tracing import Trace, trace_event
+from budget import Budget, BudgetExceeded, BudgetTracker, count_hop, log_budget_stop
+
+logger = logging.getLogger("brainchain")
 
 # Load API keys (ensure they are set in the environment)
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
 RIZA_API_KEY = os.environ.get("RIZA_API_KEY")
 TAVILY_API_KEY = os.environ.get("TAVILY_API_KEY")
 
-if not all([GROQ_API_KEY, RIZA_API_KEY, TAVILY_API_KEY]):
+# Riza is not called when every snippet runs in the local sandbox (CODE_EXECUTOR=local)
+RIZA_REQUIRED = os.environ.get("CODE_EXECUTOR", "riza").lower() != "local"
+
+if not all([GROQ_API_KEY, RIZA_API_KEY or not RIZA_REQUIRED, TAVILY_API_KEY]):
     raise ValueError("Ensure GROQ_API_KEY, RIZA_API_KEY and TAVILY_API_KEY are set as environment variables.")
 
-# Initialize LLM
-llm = ChatGroq(groq_api_key=GROQ_API_KEY, model_name="llama-3.3-70b-versatile")
+# Initialize LLM - every node calls Groq through the gateway, which retries, times out, hedges and applies the
+# optional rate limiter shared by every request in this worker, including the ReAct agents
+groq_limiter = provider_rate_limiter("GROQ_REQUESTS_PER_SECOND")
+llm = LLMGateway(
+    primary=ChatGroq(groq_api_key=GROQ_API_KEY, model_name="llama-3.3-70b-versatile", max_retries=0),  # The gateway does the retrying
+    limiter=groq_limiter,
+)
+
+# Supervisor and validator decisions fail over to a smaller model when the 70B model stays unavailable
+LLM_FALLBACK_MODEL = os.environ.get("LLM_FALLBACK_MODEL", "llama-3.1-8b-instant")
+decision_llm = llm.with_fallback(ChatGroq(groq_api_key=GROQ_API_KEY, model_name=LLM_FALLBACK_MODEL, max_retries=0)) if LLM_FALLBACK_MODEL else llm
+
+# Past search results, searched by the researcher before the web (None when disabled). Researcher answers are
+# not indexed: they are not validated yet, and a stored mistake would be found again and repeated
+knowledge_store = build_knowledge_store()
 
-# Define Tools
-tool_tavily = TavilySearchResults(max_results=2)
-tool_code_interpreter = ExecPython()
+# Define Tools - wrapped so repeated searches and code runs within and across requests are served from cache
+tool_tavily = CachedTool(
+    TavilySearchResults(max_results=2),
+    ttl_seconds=float(os.environ.get("TOOL_CACHE_TAVILY_TTL_SECONDS", "3600")),
+    normalize=normalize_search_args,
+    rate_limiter=provider_rate_limiter("TAVILY_REQUESTS_PER_SECOND"),
+    cacheable=lambda result: not isinstance(result, str),  # Tavily reports failures as a repr() string
+    on_result=index_search_results(knowledge_store) if knowledge_store is not None else None,
+)
+# CODE_EXECUTOR picks Riza, the local sandbox pool, or the pool for safe snippets and Riza for the rest
+tool_code_interpreter = CachedTool(
+    build_code_executor(ExecPython),  # Only constructed when Riza is used, since it needs RIZA_API_KEY
+    ttl_seconds=float(os.environ.get("TOOL_CACHE_RIZA_TTL_SECONDS", "3600")),
+    normalize=normalize_code_args,
+    rate_limiter=provider_rate_limiter("RIZA_REQUESTS_PER_SECOND"),
+)
 tools = [tool_tavily, tool_code_interpreter]
+# Not cached: the knowledge base is local and answers in milliseconds
+tool_knowledge = KnowledgeSearch(store=knowledge_store, k=int(os.environ.get("KNOWLEDGE_RESULTS", "3"))) if knowledge_store is not None else None
 
 # Define Supervisor Agent
 system_prompt = ('''You are a workflow supervisor managing a team of three agents: Prompt Enhancer, Researcher, and Coder. Your role is to direct the flow of tasks by selecting the next agent based on the current stage of the workflow. For each task, provide a clear rationale for your choice, ensuring that the workflow progresses logically, efficiently, and toward a timely completion.
@@ -55,20 +104,75 @@ class Supervisor(BaseModel):
     reason: str = Field(
         description="The reason for the decision, providing context on why a particular worker was chosen."
     )
+    fan_out: bool = Field(
+        default=False,
+        description="Set to true when the query needs both information gathering and calculation that can be done "
+                    "independently; the researcher and coder then work in parallel. Only used with 'researcher' or 'coder'."
+    )
+
+# Fast routing tiers in front of the LLM supervisor; ROUTER_SMALL_MODEL enables the small-model tier
+ROUTER_SMALL_MODEL = os.environ.get("ROUTER_SMALL_MODEL")
+router = build_router(
+    small_llm=LLMGateway(primary=ChatGroq(groq_api_key=GROQ_API_KEY, model_name=ROUTER_SMALL_MODEL, max_retries=0), limiter=groq_limiter) if ROUTER_SMALL_MODEL else None,
+    system_prompt=system_prompt,
+)
+
+# Workers the supervisor may dispatch together for multi-part queries
+FANOUT_WORKERS = ("researcher", "coder")
+FANOUT_ENABLED = os.environ.get("FANOUT", "on").lower() not in ("off", "0", "false")
 
-def supervisor_node(state: MessagesState) -> Command[Literal["enhancer", "researcher", "coder"]]:
-    messages = [{"role": "system", "content": system_prompt}] + state["messages"]
-    response = llm.with_structured_output(Supervisor).invoke(messages)
-    goto = response.next
-    reason = response.reason
-    print(f"Current Node: Supervisor -> Goto: {goto}")
+# Starts the likely next worker while the LLM supervisor decides (SPECULATION=on)
+speculator = build_speculator()
+
+async def supervisor_node(state: MessagesState, config: RunnableConfig) -> Command[Literal["enhancer", "researcher", "coder", "supervisor", "validator"]]:
+    count_hop(config)
+    history = compact_for_node("supervisor", state["messages"])
+    decision = await router.route(history, config)
+    speculation = None
+    if decision is None:
+        # No fast tier was confident enough - ask the 70B supervisor, with the likely next worker already running
+        _, turn = split_turns(state["messages"])
+        context = speculation_context(turn)
+        speculation = speculator.start(state["messages"], config, WORKERS)
+        started = time.perf_counter()
+        messages = [{"role": "system", "content": system_prompt}] + history
+        try:
+            response = await decision_llm.with_structured_output(Supervisor).ainvoke(messages, config)
+        except BaseException:
+            if speculation is not None:
+                await speculation.cancel()
+            raise
+        decision_seconds = time.perf_counter() - started
+        decision = RouteDecision(next=response.next, reason=response.reason, fan_out=response.fan_out, tier="llm")
+        router.record(decision, decision_seconds)
+        speculator.observe(context, "fan_out" if decision.fan_out else decision.next)
+    goto = decision.next
+    if FANOUT_ENABLED and decision.fan_out and goto in FANOUT_WORKERS:
+        # Run every worker as a parallel branch; each hands off to the validator, which runs once after both
+        goto = list(FANOUT_WORKERS)
+    reason = decision.reason
+    trace_event(config, "route", "supervisor", next="+".join(goto) if isinstance(goto, list) else goto, tier=decision.tier, confidence=decision.confidence)
+    update = [HumanMessage(content=reason, name="supervisor")]
+    if speculation is not None:
+        hit = speculation.node == goto
+        trace_event(config, "speculate", "supervisor", worker=speculation.node, outcome="hit" if hit else "miss")
+        if not hit:
+            await speculator.discard(speculation)
+        else:
+            # The worker already ran (or is running) - take its message and skip its node
+            count_hop(config)
+            update.append(await speculator.commit(speculation, decision_seconds))
+            logger.info("supervisor -> %s (decided by %s, speculated)", goto, decision.tier)
+            logger.info("%s -> %s", goto, WORKER_NEXT[goto])
+            return Command(update={"messages": update}, goto=WORKER_NEXT[goto])
+    logger.info("supervisor -> %s (decided by %s)", goto, decision.tier)
     return Command(
-        update={"messages": [HumanMessage(content=reason, name="supervisor")]},
+        update={"messages": update},
         goto=goto,
     )
 
 # Define Enhancer Agent
-def enhancer_node(state: MessagesState) -> Command[Literal["supervisor"]]:
+async def enhance(state: MessagesState, config: RunnableConfig) -> HumanMessage:
         system_prompt = (
         "You are an advanced query enhancer. Your task is to:\n"
         "Don't ask anything to the user, select the most appropriate prompt"
@@ -76,56 +180,84 @@ def enhancer_node(state: MessagesState) -> Command[Literal["supervisor"]]:
         "2. Identify any ambiguities in the query.\n"
         "3. Generate a more precise and actionable version of the original request.\n"
     )
-        messages = [{"role": "system", "content": system_prompt}] + state["messages"]
-        enhanced_query = llm.invoke(messages).content
-        print(f"Current Node: Enhancer -> Goto: supervisor")
-        return Command(
+        messages = [{"role": "system", "content": system_prompt}] + compact_for_node("enhancer", state["messages"])
+        enhanced_query = (await llm.ainvoke(messages, config)).content
+        return HumanMessage(content=enhanced_query, name="enhancer")
+
+async def enhancer_node(state: MessagesState, config: RunnableConfig) -> Command[Literal["supervisor"]]:
+    count_hop(config)
+    message = await enhance(state, config)
+    logger.info("enhancer -> supervisor")
+    return Command(
         update={
-            "messages": [
-                HumanMessage(content=enhanced_query, name="enhancer")
-            ]
+            "messages": [message]
         },
         goto="supervisor",
     )
 
-# Define Researcher Agent
-def research_node(state: MessagesState) -> Command[Literal["validator"]]:
-    research_agent = create_react_agent(
+# Agent registry - the ReAct sub-agents hold no per-request state, so one instance of each serves every request
+agents = {}
+
+def build_agents():
+    researcher_prompt = "You are a researcher. Focus on gathering information and generating content. Do not perform any other tasks"
+    if tool_knowledge is not None:
+        researcher_prompt += (f". Search {tool_knowledge.name} first, and search the web only when it returns nothing relevant "
+            "or nothing recent enough for the question")
+    agents["researcher"] = create_react_agent(
         llm,
-        tools=[tool_tavily],
-        state_modifier="You are a researcher. Focus on gathering information and generating content. Do not perform any other tasks"  # Instruction to restrict the agent's behavior
+        tools=[tool_knowledge, tool_tavily] if tool_knowledge is not None else [tool_tavily],
+        # Instruction to restrict the agent's behavior, applied on top of a compacted transcript
+        state_modifier=compacting_prompt("researcher", researcher_prompt)
     )
-    result = research_agent.invoke(state)
-    print(f"Current Node: Researcher -> Goto: validator")
+    agents["coder"] = create_react_agent(
+        llm,
+        tools=[tool_code_interpreter],
+        state_modifier=compacting_prompt("coder", ("You are a coder and analyst. Focus on mathematical caluclations, analyzing, solving math questions, "
+            "and executing code. Handle technical problem-solving and data tasks."
+    ))
+    )
+    return agents
+
+# Define Researcher Agent
+async def research(state: MessagesState, config: RunnableConfig) -> HumanMessage:
+    result = await agents["researcher"].ainvoke(state, config)
+    # The validator's rule tier checks whether the agent's tool calls succeeded
+    tools_used = tool_report(result["messages"][len(state["messages"]):])
+    return HumanMessage(content=result["messages"][-1].content, name="researcher", additional_kwargs={"tools": tools_used})
+
+async def research_node(state: MessagesState, config: RunnableConfig) -> Command[Literal["validator"]]:
+    count_hop(config)
+    message = await research(state, config)
+    logger.info("researcher -> validator")
     return Command(
         update={
-            "messages": [
-                HumanMessage(content=result["messages"][-1].content, name="researcher")
-            ]
+            "messages": [message]
         },
         goto="validator",
     )
 
 # Define Coder Agent
-def code_node(state: MessagesState) -> Command[Literal["validator"]]:
-    code_agent = create_react_agent(
-        llm,
-        tools=[tool_code_interpreter],
-        state_modifier=("You are a coder and analyst. Focus on mathematical caluclations, analyzing, solving math questions, "
-            "and executing code. Handle technical problem-solving and data tasks."
-    )
-    )
-    result = code_agent.invoke(state)
-    print(f"Current Node: Coder -> Goto: validator")
+async def code(state: MessagesState, config: RunnableConfig) -> HumanMessage:
+    result = await agents["coder"].ainvoke(state, config)
+    # The validator's rule tier checks whether the agent's tool calls succeeded
+    tools_used = tool_report(result["messages"][len(state["messages"]):])
+    return HumanMessage(content=result["messages"][-1].content, name="coder", additional_kwargs={"tools": tools_used})
+
+async def code_node(state: MessagesState, config: RunnableConfig) -> Command[Literal["validator"]]:
+    count_hop(config)
+    message = await code(state, config)
+    logger.info("coder -> validator")
     return Command(
         update={
-            "messages": [
-                HumanMessage(content=result["messages"][-1].content, name="coder")
-            ]
+            "messages": [message]
         },
         goto="validator",
     )
 
+# Worker bodies the speculator may start ahead of the supervisor, and the node each hands off to
+WORKERS = {"enhancer": enhance, "researcher": research, "coder": code}
+WORKER_NEXT = {"enhancer": "supervisor", "researcher": "validator", "coder": "validator"}
+
 # Define Validator Agent
 
 class Validator(BaseModel):
@@ -155,22 +287,45 @@ class Validator(BaseModel):
     next: Literal["supervisor", "FINISH"] = Field(description="Specifies the next worker in the pipeline: 'supervisor' to continue or 'FINISH' to terminate.")
     reason: str = Field(description="The reason for the decision.")
 
-def validator_node(state: MessagesState) -> Command[Literal["supervisor", "__end__"]]:
-    user_question = state["messages"][0].content
-    agent_answer = state["messages"][-1].content
-    messages = [
-        {"role": "system", "content": validator_system_prompt},
-        {"role": "user", "content": user_question},
-        {"role": "assistant", "content": agent_answer},
-    ]
-    response = llm.with_structured_output(Validator).invoke(messages)
-    goto = response.next
-    reason = response.reason
+# Deterministic checks in front of the LLM validator; only borderline answers get an LLM verdict
+validator = build_validator()
+
+async def validator_node(state: MessagesState, config: RunnableConfig) -> Command[Literal["supervisor", "__end__"]]:
+    count_hop(config)
+    # In a conversation thread the question is the latest user message; earlier turns are context for it
+    earlier, turn = split_turns(state["messages"])
+    question = user_question = turn[0].content
+    if earlier:
+        user_question = f"{conversation_digest(earlier).content}\n\nCurrent question: {user_question}"
+    # After a fan-out both branches have answered; merge them so one validator pass covers both
+    agent_answer = best_answer(turn) or state["messages"][-1].content
+    started = time.perf_counter()
+    verdict = await validator.validate(question, agent_answer, latest_worker_outputs(turn), config)
+    fast_seconds = time.perf_counter() - started
+    if verdict is None or validator.should_shadow():
+        # Borderline answer, or a sampled check of a confident rule verdict against the LLM
+        started = time.perf_counter()
+        messages = [
+            {"role": "system", "content": validator_system_prompt},
+            {"role": "user", "content": user_question},
+            {"role": "assistant", "content": agent_answer},
+        ]
+        response = await decision_llm.with_structured_output(Validator).ainvoke(messages, config)
+        llm_verdict = Verdict(next=response.next, reason=response.reason, tier="llm")
+        if verdict is not None:
+            validator.record(verdict, fast_seconds, shadowed=llm_verdict)
+        verdict = llm_verdict
+        validator.record(verdict, time.perf_counter() - started)
+    else:
+        validator.record(verdict, fast_seconds)
+    trace_event(config, "validate", "validator", next=verdict.next, tier=verdict.tier, confidence=verdict.confidence)
+    goto = verdict.next
+    reason = verdict.reason
     if goto == "FINISH" or goto == END:
         goto = END
-        print("Transitioning to END")
+        logger.info("validator -> END")
     else:
-        print(f"Current Node: Validator -> Goto: Supervisor")
+        logger.info("validator -> supervisor")
     return Command(
         update={
             "messages": [
@@ -181,7 +336,7 @@ def validator_node(state: MessagesState) -> Command[Literal["supervisor", "__end
     )
 
 # Define the Workflow Graph
-def create_workflow():
+def create_workflow(checkpointer=None):
     # Initialize the StateGraph with MessagesState to manage the flow of messages between nodes
     builder = StateGraph(MessagesState)
 
@@ -195,18 +350,143 @@ def create_workflow():
 
     # Add edges and nodes to define the workflow of the graph
     builder.add_edge(START, "supervisor")  # Connect the start node to the supervisor node
-    # Compile the graph to finalize its structure
-    graph = builder.compile()
+    # Compile the graph to finalize its structure; with a checkpointer each thread's state persists between requests
+    graph = builder.compile(checkpointer=checkpointer)
     return graph
 
-# Main function to run the workflow
-def run_workflow(user_query: str):
-    workflow = create_workflow()
+# The compiled graph is immutable and safe to share between concurrent requests, so it is built once per process.
+# One-off queries use a graph without a checkpointer so they do not write state nobody will read back.
+compiled_workflow = None
+threaded_workflow = None
+_init_lock = threading.Lock()
+
+def init_workflow(checkpointer=None, reuse=False):
+    """Build the agent registry and compile the graph, plus a threaded graph when a checkpointer is given. Returns the seconds spent doing so.
+
+    With ``reuse``, agents and a graph compiled earlier in this process (e.g. preloaded before a
+    pre-fork server forked its workers) are kept, and only the threaded graph is built.
+    """
+    global compiled_workflow, threaded_workflow
+    with _init_lock:
+        start = time.perf_counter()
+        if not (reuse and compiled_workflow is not None):
+            build_agents()
+            compiled_workflow = create_workflow()
+        threaded_workflow = create_workflow(checkpointer) if checkpointer is not None else None
+        return time.perf_counter() - start
+
+def get_workflow(thread_id: str = None):
+    if compiled_workflow is None:
+        init_workflow()
+    if thread_id is None:
+        return compiled_workflow
+    if threaded_workflow is None:
+        raise ValueError("Conversation threads are disabled: no checkpointer is configured (see CHECKPOINTER).")
+    return threaded_workflow
+
+def _run_config(tracker: BudgetTracker, trace: Trace, thread_id: str = None) -> dict:
+    config = tracker.config()
+    config["callbacks"].append(trace)
+    config["configurable"]["trace"] = trace
+    config["configurable"]["speculation"] = {"started": 0}  # Speculative runs so far, capped per request
+    if thread_id is not None:
+        config["configurable"]["thread_id"] = thread_id
+    return config
+
+async def _with_deadline(awaitable, tracker: BudgetTracker):
+    try:
+        return await asyncio.wait_for(awaitable, tracker.remaining_seconds())
+    except asyncio.TimeoutError:
+        raise BudgetExceeded("timeout_seconds", tracker.usage())
+
+# Main async entry point - every node awaits the LLM and tools, so many queries can share one event loop
+async def arun_workflow(user_query: str, budget: Budget = None, thread_id: str = None):
+    """Run the workflow within ``budget``.
+
+    When a limit is hit the run stops and the state reached so far is returned with
+    ``partial=True``, the name of the limit in ``stopped_by`` and the best answer so far in ``answer``.
+
+    With a ``thread_id`` the query continues that conversation: earlier turns are loaded from the
+    checkpointer, and only the messages of this turn are returned.
+    """
+    workflow = get_workflow(thread_id)
+    tracker = BudgetTracker(budget)
+    trace = Trace(user_query)
     inputs = {"messages": [HumanMessage(content=user_query)]}
-    results = workflow.invoke(inputs)
+    results = inputs
+
+    async def consume():
+        nonlocal results
+        async for state in workflow.astream(inputs, _run_config(tracker, trace, thread_id), stream_mode="values"):
+            results = state
+
+    try:
+        await _with_deadline(consume(), tracker)
+    except BudgetExceeded as e:
+        log_budget_stop(e.limit, tracker)
+        trace.finish("partial", stopped_by=e.limit, usage=tracker.usage())
+        _, turn = split_turns(results["messages"])
+        return {**results, "messages": turn, "partial": True, "stopped_by": e.limit, "answer": best_answer(turn)}
+    except Exception as e:
+        trace.finish("error", error=repr(e), usage=tracker.usage())
+        raise
+    trace.finish("ok", usage=tracker.usage())
+    if thread_id is not None:
+        _, turn = split_turns(results["messages"])
+        return {**results, "messages": turn, "thread_id": thread_id}
     return results
 
+# Nodes whose LLM tokens are forwarded while they are generated - they produce the answer the user reads
+STREAMED_TOKEN_NODES = ("researcher", "coder")
+
+async def astream_workflow(user_query: str, budget: Budget = None, thread_id: str = None):
+    """Run the workflow and yield events as they happen.
+
+    A ``message`` event is yielded each time a node finishes, and ``token`` events are yielded
+    while the researcher or coder is still generating its answer. If the budget runs out, a final
+    ``partial`` event carries the limit that was hit and the best answer so far. A ``thread_id``
+    continues that conversation, as in ``arun_workflow``.
+    """
+    workflow = get_workflow(thread_id)
+    tracker = BudgetTracker(budget)
+    trace = Trace(user_query)
+    inputs = {"messages": [HumanMessage(content=user_query)]}
+    transcript = []
+    status = "error"
+    stream = workflow.astream(inputs, _run_config(tracker, trace, thread_id), stream_mode=["updates", "messages"])
+    try:
+        while True:
+            try:
+                mode, chunk = await _with_deadline(stream.__anext__(), tracker)
+            except StopAsyncIteration:
+                break
+            if mode == "messages":
+                message, metadata = chunk
+                # Tokens from inside a ReAct agent carry the agent's own node name; the outer node is the namespace root
+                node = metadata.get("langgraph_checkpoint_ns", "").split(":")[0]
+                # A speculative run may still be discarded, so its text only reaches the client as the committed message
+                if node in STREAMED_TOKEN_NODES and not metadata.get("speculative") and isinstance(message.content, str) and message.content:
+                    yield {"type": "token", "node": node, "content": message.content}
+                continue
+            for node, update in chunk.items():
+                for message in (update or {}).get("messages", []):
+                    transcript.append(message)
+                    yield {"type": "message", "node": node, "name": message.name, "content": message.content}
+        status = "ok"
+    except BudgetExceeded as e:
+        log_budget_stop(e.limit, tracker)
+        status = "partial"
+        yield {"type": "partial", "stopped_by": e.limit, "answer": best_answer(transcript)}
+    finally:
+        await stream.aclose()
+        trace.finish(status, usage=tracker.usage())
+
+# Synchronous wrapper for scripts and callers that are not running an event loop
+def run_workflow(user_query: str):
+    return asyncio.run(arun_workflow(user_query))
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Example usage:
     user_query = "What is the GDP growth rate of USA"
     result = run_workflow(user_query)
@@ -0,0 +1,91 @@
+# benchmarks/bench_admission.py
+# Overload test of admission control with the fake LLM. Interactive and batch requests arrive at a fixed
+# rate above what WORKFLOW_CONCURRENCY workflows can serve, once through one unbounded FIFO queue (every
+# request waits, as without admission control) and once through the bounded priority queues. Reports the status
+# codes per class and the latency percentiles of admitted (200) requests. The response cache is disabled.
+#
+#   python benchmarks/bench_admission.py --concurrency 4 --overload 3 --duration 10 --latency 0.05
+import os
+import time
+import random
+import asyncio
+import argparse
+from fakes import install_fake_llm, setup_backend_path
+from bench_gateway import percentile
+
+setup_backend_path()
+os.environ["RESPONSE_CACHE"] = "off"
+
+import httpx
+import workflow
+import main
+from admission import AdmissionController
+
+
+async def load(client, rate: float, duration: float, interactive_share: float, prioritized: bool):
+    """Open-loop arrivals: requests are sent on schedule whether or not earlier ones have finished.
+    Without ``prioritized`` every request goes to the server as interactive, but is still reported under its own class."""
+    outcomes = {"interactive": [], "batch": []}
+
+    async def one(i: int, priority: str):
+        started = time.perf_counter()
+        headers = {"X-Priority": priority} if prioritized else {}
+        response = await client.post("/process", json={"text": f"What is the GDP growth rate of country #{i}"}, headers=headers)
+        outcomes[priority].append((response.status_code, time.perf_counter() - started))
+
+    tasks, i = [], 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        priority = "interactive" if random.random() < interactive_share else "batch"
+        tasks.append(asyncio.create_task(one(i, priority)))
+        i += 1
+        await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+    return outcomes
+
+
+def report(name: str, outcomes: dict):
+    for priority, results in outcomes.items():
+        statuses = {}
+        for status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        admitted = [seconds for status, seconds in results if status == 200]
+        p50, p99, worst = (percentile(admitted, p) for p in (50, 99, 100))
+        codes = " ".join(f"{status}:{count}" for status, count in sorted(statuses.items()))
+        print(f"{name:<11} {priority:<12} {len(results):>5} {codes:<24} {p50:>8.2f} {p99:>8.2f} {worst:>8.2f}")
+
+
+async def bench(args):
+    random.seed(3)
+    install_fake_llm(workflow, latency=args.latency)
+    workflow.init_workflow()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        (await client.post("/process", json={"text": "What is the GDP growth rate of USA"})).raise_for_status()
+        service = time.perf_counter() - started
+        rate = args.overload * args.concurrency / service
+        print(f"one workflow: {service:.2f} s, capacity: {args.concurrency / service:.1f} requests/s, offered: {rate:.1f} requests/s")
+        print(f"{'queues':<11} {'class':<12} {'sent':>5} {'status codes':<24} {'p50 s':>8} {'p99 s':>8} {'max s':>8}")
+        setups = {
+            "unbounded": AdmissionController(args.concurrency, max_queued={"interactive": None}, max_wait_seconds={"interactive": None}),
+            "bounded": AdmissionController(
+                args.concurrency,
+                max_queued={"interactive": args.concurrency * 2, "batch": args.concurrency * 4},
+                max_wait_seconds={"interactive": args.interactive_wait, "batch": None},
+            ),
+        }
+        for name, controller in setups.items():
+            main.admission = controller
+            report(name, await load(client, rate, args.duration, args.interactive_share, prioritized=name == "bounded"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overload test of admission control with stubbed agents")
+    parser.add_argument("--concurrency", type=int, default=4, help="Workflows running at once (WORKFLOW_CONCURRENCY)")
+    parser.add_argument("--overload", type=float, default=3, help="Offered load as a multiple of capacity")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of arrivals per setup")
+    parser.add_argument("--interactive-share", type=float, default=0.5)
+    parser.add_argument("--interactive-wait", type=float, default=2, help="Longest queue wait of an interactive request")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of injected latency per LLM call")
+    asyncio.run(bench(parser.parse_args()))
@@ -0,0 +1,50 @@
+# benchmarks/bench_async.py
+# Load benchmark for POST /process with a fake LLM that injects latency.
+# Throughput should grow with concurrency because workflows no longer block the event loop.
+#
+#   python benchmarks/bench_async.py --latency 0.05 --requests 32
+import os
+import time
+import asyncio
+import argparse
+from fakes import install_fake_llm, setup_backend_path
+
+setup_backend_path()
+os.environ["RESPONSE_CACHE"] = "off"  # Every request should run the workflow
+
+import httpx
+import workflow
+import main
+
+
+async def run_level(client, concurrency: int, total: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            response = await client.post("/process", json={"text": f"What is the GDP growth rate of USA #{i}"})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def bench(latency: float, total: int, levels):
+    install_fake_llm(workflow, latency=latency)
+    workflow.init_workflow()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'concurrency':>12} {'requests':>9} {'seconds':>9} {'req/s':>9}")
+        for concurrency in levels:
+            elapsed = await run_level(client, concurrency, total)
+            print(f"{concurrency:>12} {total:>9} {elapsed:>9.2f} {total / elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /process throughput against a fake LLM")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of injected latency per LLM call")
+    parser.add_argument("--requests", type=int, default=32, help="Requests sent at each concurrency level")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+    asyncio.run(bench(args.latency, args.requests, args.levels))
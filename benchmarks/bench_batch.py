@@ -0,0 +1,59 @@
+# benchmarks/bench_batch.py
+# Compares answering a query set with sequential POST /process calls against one POST /process/batch,
+# using the fake LLM. The response cache is disabled so both sides do the same work; the batch side
+# still benefits from running duplicates once.
+#
+#   python benchmarks/bench_batch.py --queries 40 --duplicates 0.25 --latency 0.05
+import os
+import json
+import time
+import asyncio
+import argparse
+from fakes import install_fake_llm, setup_backend_path
+
+setup_backend_path()
+os.environ["RESPONSE_CACHE"] = "off"
+
+import httpx
+import batch
+import workflow
+import main
+
+
+def make_queries(count: int, duplicate_ratio: float):
+    unique = max(1, round(count * (1 - duplicate_ratio)))
+    return [f"What is the GDP growth rate of country #{i % unique}" for i in range(count)]
+
+
+async def bench(count: int, duplicate_ratio: float, latency: float):
+    install_fake_llm(workflow, latency=latency)
+    workflow.init_workflow()
+    queries = make_queries(count, duplicate_ratio)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        for query in queries:
+            (await client.post("/process", json={"text": query})).raise_for_status()
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        statuses = {}
+        async with client.stream("POST", "/process/batch", json={"queries": queries}) as response:
+            async for line in response.aiter_lines():
+                item = json.loads(line)
+                if item["type"] == "item":
+                    statuses[item["status"]] = statuses.get(item["status"], 0) + 1
+        batched = time.perf_counter() - start
+
+    print(f"queries: {count} ({len(set(queries))} unique), batch concurrency: {batch.BATCH_CONCURRENCY}")
+    print(f"sequential /process: {sequential:8.2f} s {count / sequential:8.2f} queries/s")
+    print(f"/process/batch:      {batched:8.2f} s {count / batched:8.2f} queries/s  {statuses}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare /process/batch with sequential /process calls")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--duplicates", type=float, default=0.25, help="Fraction of queries that repeat an earlier one")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of injected latency per LLM call")
+    args = parser.parse_args()
+    asyncio.run(bench(args.queries, args.duplicates, args.latency))
@@ -0,0 +1,63 @@
+# benchmarks/bench_exec.py
+# Per-snippet latency percentiles and throughput of the local sandbox pool, against a stand-in for a
+# remote executor that only waits one network round trip, at each concurrency level. Needs no API keys.
+#
+#   python benchmarks/bench_exec.py --runs 200 --concurrency 1 4 8 --workers 4 --round-trip 0.3
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from fakes import setup_backend_path
+from bench_gateway import percentile
+
+setup_backend_path()
+
+from sandbox import SandboxPool
+
+SNIPPETS = [
+    "print(sum(i * i for i in range(10000)))",
+    "import math\nprint(math.factorial(200) % 1000003)",
+    "import statistics\nprint(statistics.mean([3, 1, 4, 1, 5, 9, 2, 6]))",
+    "print(2 ** 0.5 * 150)",
+]
+
+
+def run(execute, runs: int, concurrency: int):
+    latencies = []
+
+    def one(i):
+        started = time.perf_counter()
+        execute(SNIPPETS[i % len(SNIPPETS)])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(runs)))
+    return latencies, time.perf_counter() - started
+
+
+def main(args):
+    pool = SandboxPool(size=args.workers)
+    started = time.perf_counter()
+    pool.warm()
+    print(f"warm-up of {args.workers} sandbox workers: {(time.perf_counter() - started) * 1000:.1f} ms")
+    setups = {
+        "remote (stub)": lambda code: time.sleep(args.round_trip),
+        "local pool": pool.run,
+    }
+    print(f"{'executor':<14} {'concurrency':>11} {'p50 ms':>8} {'p95 ms':>8} {'runs/s':>8}")
+    for concurrency in args.concurrency:
+        for name, execute in setups.items():
+            latencies, seconds = run(execute, args.runs, concurrency)
+            p50, p95 = (percentile(latencies, p) * 1000 for p in (50, 95))
+            print(f"{name:<14} {concurrency:>11} {p50:>8.1f} {p95:>8.1f} {args.runs / seconds:>8.1f}")
+    print(pool.get_stats())
+    pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the local sandbox pool against a remote executor's round trip")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--workers", type=int, default=4, help="Sandbox worker processes")
+    parser.add_argument("--round-trip", type=float, default=0.3, help="Seconds the stub remote executor takes per call")
+    main(parser.parse_args())
@@ -0,0 +1,48 @@
+# benchmarks/bench_frontend.py
+# Rerun time of the Streamlit UI against the length of the chat history, using Streamlit's AppTest
+# (no browser and no backend). With paged history only the latest exchanges are rendered in full,
+# so rerun time should stay flat as the history grows; --expanded 1000 renders everything, as before.
+#
+#   python benchmarks/bench_frontend.py --sizes 0 10 50 200 --reruns 5
+import os
+import time
+import argparse
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend", "app.py")
+AGENTS = ("supervisor", "enhancer", "supervisor", "researcher", "validator")
+
+
+def make_history(size: int):
+    history = []
+    for i in range(size):
+        query = f"What is the GDP growth rate of country #{i}"
+        messages = [{"type": "human", "content": query}] + [
+            {"name": agent, "content": f"{agent} output for question #{i}. " + "Detail " * 60} for agent in AGENTS
+        ]
+        history.append({"query": query, "response": {"messages": messages}, "answer": messages[-2]["content"]})
+    return history
+
+
+def measure(size: int, reruns: int) -> float:
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+    app.session_state["chat_history"] = make_history(size)
+    app.run()  # The first run also fills st.cache_data
+    start = time.perf_counter()
+    for _ in range(reruns):
+        app.run()
+    return (time.perf_counter() - start) / reruns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure Streamlit rerun time against the chat history length")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 10, 50, 200])
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--expanded", type=int, help="Exchanges rendered in full (HISTORY_EXPANDED)")
+    args = parser.parse_args()
+    if args.expanded is not None:
+        os.environ["HISTORY_EXPANDED"] = str(args.expanded)
+    # The app trims the history only when an exchange is added, so every size is rendered as given
+    print(f"{'exchanges':>10} {'rerun ms':>10}")
+    for size in args.sizes:
+        print(f"{size:>10} {measure(size, args.reruns) * 1000:>10.1f}")
@@ -0,0 +1,67 @@
+# benchmarks/bench_gateway.py
+# Success rate and latency percentiles of LLM calls against a fake provider that injects errors
+# and latency spikes: calling the provider directly, through the gateway with retries, and through
+# the gateway with hedged requests as well.
+#
+#   python benchmarks/bench_gateway.py --calls 400 --error-rate 0.1 --spike-rate 0.05
+import time
+import asyncio
+import argparse
+from fakes import FakeChatModel, setup_backend_path
+
+setup_backend_path()
+
+from llm_gateway import LLMGateway
+
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else float("nan")
+
+
+async def run(model, calls: int, concurrency: int):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with gate:
+            started = time.perf_counter()
+            try:
+                await model.ainvoke("What is the GDP growth rate of USA")
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, failures
+
+
+async def bench(args):
+    def provider():
+        return FakeChatModel(latency=args.latency, error_rate=args.error_rate, spike_rate=args.spike_rate, spike_latency=args.spike_latency)
+
+    setups = {
+        "direct": provider(),
+        "gateway": LLMGateway(primary=provider(), backoff_seconds=0.05, timeout_seconds=args.timeout),
+        "gateway+hedge": LLMGateway(primary=provider(), backoff_seconds=0.05, timeout_seconds=args.timeout, hedge_percentile=90, hedge_min_samples=20),
+    }
+    print(f"{'setup':<14} {'success':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'provider calls':>15}")
+    for name, model in setups.items():
+        latencies, failures = await run(model, args.calls, args.concurrency)
+        fake = model.primary if isinstance(model, LLMGateway) else model
+        success = len(latencies) / args.calls
+        p50, p95, p99 = (percentile(latencies, p) * 1000 for p in (50, 95, 99))
+        print(f"{name:<14} {success:>8.1%} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {fake.calls:>15}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the LLM gateway against a fake provider with injected failures")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Normal provider latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="Fraction of provider calls failing with 429")
+    parser.add_argument("--spike-rate", type=float, default=0.05, help="Fraction of provider calls hitting a latency spike")
+    parser.add_argument("--spike-latency", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=5.0, help="Gateway per-attempt timeout in seconds")
+    asyncio.run(bench(parser.parse_args()))
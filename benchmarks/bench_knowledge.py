@@ -0,0 +1,69 @@
+# benchmarks/bench_knowledge.py
+# Search latency and hit rate of the local knowledge base, against a stand-in for Tavily that only
+# waits one network round trip. Indexes synthetic search results, then looks up questions about
+# indexed topics and about topics that were never searched. Needs no API keys.
+#
+#   python benchmarks/bench_knowledge.py --documents 5000 --searches 500 --round-trip 0.8
+import os
+import time
+import random
+import argparse
+import tempfile
+from fakes import setup_backend_path
+from bench_gateway import percentile
+
+setup_backend_path()
+
+from knowledge import KnowledgeStore
+
+COUNTRIES = ["France", "Germany", "Japan", "Brazil", "India", "Canada", "Kenya", "Chile", "Norway", "Vietnam"]
+TOPICS = ["GDP growth", "inflation rate", "unemployment", "population", "exports", "interest rate", "public debt", "energy mix"]
+
+
+def document(country: str, topic: str, year: int) -> dict:
+    value = round(random.uniform(0.5, 9.5), 1)
+    return {
+        "url": f"https://example.org/{country.lower()}/{topic.replace(' ', '-')}/{year}",
+        "title": f"{country} {topic} {year}",
+        "content": f"The {topic} of {country} was {value} percent in {year}, according to the national statistics office.",
+    }
+
+
+def main(args):
+    random.seed(7)
+    path = os.path.join(tempfile.mkdtemp(prefix="brainchain-knowledge-"), "knowledge.db")
+    store = KnowledgeStore(path)
+    started = time.perf_counter()
+    indexed = 0
+    while indexed < args.documents:
+        country, topic = random.choice(COUNTRIES), random.choice(TOPICS)
+        year = random.randint(1990, 2024)
+        indexed += store.add_search_results(f"{topic} {country} {year}", [document(country, topic, year)])
+    print(f"indexed {indexed} documents in {time.perf_counter() - started:.2f} s")
+
+    # Unknown topics are never indexed, so the share of hits is about 1 - args.unknown
+    latencies = []
+    for _ in range(args.searches):
+        topic = random.choice(TOPICS) if random.random() >= args.unknown else "coffee production"
+        question = f"What was the {topic} of {random.choice(COUNTRIES)} in {random.randint(1990, 2024)}?"
+        started = time.perf_counter()
+        results = store.search(question)
+        latencies.append(time.perf_counter() - started)
+        if not results:
+            # A miss falls back to live search
+            latencies[-1] += args.round_trip
+    stats = store.get_stats()
+    p50, p95, p99 = (percentile(latencies, p) * 1000 for p in (50, 95, 99))
+    print(f"{'setup':<22} {'hit rate':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    print(f"{'web search only':<22} {0:>8.1%} {args.round_trip * 1000:>9.1f} {args.round_trip * 1000:>9.1f} {args.round_trip * 1000:>9.1f}")
+    print(f"{'knowledge base first':<22} {stats['hit_rate']:>8.1%} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f}")
+    print(stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark knowledge base searches against a web search round trip")
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--searches", type=int, default=500)
+    parser.add_argument("--unknown", type=float, default=0.2, help="Share of questions about topics that were never indexed")
+    parser.add_argument("--round-trip", type=float, default=0.8, help="Seconds a stubbed Tavily search takes")
+    main(parser.parse_args())
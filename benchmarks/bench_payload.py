@@ -0,0 +1,52 @@
+# benchmarks/bench_payload.py
+# Payload size and serialization time of the /process response modes (final, summary, full).
+# One workflow run with the fake LLM provides the transcript; --loops repeats its agent messages
+# to mimic runs where the validator sent the work back to the supervisor several times.
+#
+#   python benchmarks/bench_payload.py --loops 3 --answer-words 400 --iterations 500
+import gzip
+import json
+import time
+import asyncio
+import argparse
+from fakes import install_fake_llm, setup_backend_path
+
+setup_backend_path()
+
+from fastapi.encoders import jsonable_encoder
+import workflow
+import responses
+
+
+def build_result(loops: int, answer_words: int) -> dict:
+    install_fake_llm(workflow, latency=0, answer=" ".join(["insight"] * answer_words))
+    workflow.init_workflow()
+    result = asyncio.run(workflow.arun_workflow("What is the GDP growth rate of USA"))
+    question, rest = result["messages"][0], result["messages"][1:]
+    return jsonable_encoder({**result, "messages": [question] + rest * loops})
+
+
+def measure(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare payload size and serialization time across response modes")
+    parser.add_argument("--loops", type=int, default=3, help="Supervisor/validator loops in the transcript")
+    parser.add_argument("--answer-words", type=int, default=400, help="Words in every fake LLM output")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    result = build_result(args.loops, args.answer_words)
+    print(f"messages: {len(result['messages'])}, orjson available: {responses.orjson is not None}")
+    print(f"{'mode':<8} {'bytes':>10} {'gzip bytes':>11} {'json ms':>9} {'orjson ms':>10} {'gzip ms':>9}")
+    for mode in ("final", "summary", "full"):
+        payload = {"status": "success", "result": responses.shape_result(result, mode)}
+        body = responses.dumps(payload)
+        stdlib = measure(lambda: json.dumps({"status": "success", "result": responses.shape_result(result, mode)}), args.iterations)
+        fast = measure(lambda: responses.dumps({"status": "success", "result": responses.shape_result(result, mode)}), args.iterations)
+        compress = measure(lambda: gzip.compress(body, compresslevel=5), args.iterations)
+        print(f"{mode:<8} {len(body):>10} {len(gzip.compress(body, compresslevel=5)):>11} {stdlib * 1000:>9.3f} {fast * 1000:>10.3f} {compress * 1000:>9.3f}")
@@ -0,0 +1,69 @@
+# benchmarks/bench_routing.py
+# Checks the rule tier of the supervisor routing on a fixed set of enhanced queries and measures its
+# latency. Each case states the route the rules should take, or None when the decision belongs to the
+# next tier; a case that lands elsewhere is reported and the run exits with status 1. Needs no API keys.
+#
+#   python benchmarks/bench_routing.py --repeat 1000
+import sys
+import time
+import asyncio
+import argparse
+from fakes import setup_backend_path
+from bench_gateway import percentile
+
+setup_backend_path()
+
+from langchain_core.messages import HumanMessage
+from routing import RoutingLayer, RuleRouter
+
+# (question, enhanced query, expected route: a worker, "fan_out", or None for "left to the next tier")
+CASES = [
+    ("2 + 2 * 3", "Evaluate 2 + 2 * 3.", "coder"),
+    ("factorial of 12", "Give 12 multiplied down to 1.", "coder"),  # Exactly one coder keyword
+    ("Who wrote Hamlet", "Name the author of Hamlet.", "researcher"),  # Exactly one researcher keyword
+    ("Calculate the average of 3, 8 and 10", "Calculate the mean of 3, 8 and 10.", "coder"),
+    ("What is the latest news about the population of Japan", "Report the latest population figure of Japan.", "researcher"),
+    ("Look up the revenue of Apple in 2023 and calculate its CAGR", "Find Apple's 2023 revenue and compute its CAGR since 2018.", None),
+    ("Hello there", "Greet the user.", None),
+]
+
+
+def messages_for(question: str, enhanced: str):
+    return [HumanMessage(content=question), HumanMessage(content=enhanced, name="enhancer")]
+
+
+async def bench(args) -> int:
+    rules = RuleRouter()
+    layer = RoutingLayer([rules], min_confidence=args.min_confidence)
+    failures = 0
+    print(f"{'expected':<11} {'routed':<11} {'confidence':>10}  query")
+    for question, enhanced, expected in CASES:
+        decision = await rules.route(messages_for(question, enhanced))
+        # The same threshold RoutingLayer applies
+        routed = None
+        if decision is not None and decision.confidence >= args.min_confidence:
+            routed = "fan_out" if decision.fan_out else decision.next
+        shown = f"{decision.confidence:.2f}" if decision is not None else "-"
+        mark = "" if routed == expected else "   <- MISMATCH"
+        failures += routed != expected
+        print(f"{str(expected):<11} {str(routed):<11} {shown:>10}  {question}{mark}")
+
+    latencies = []
+    for _ in range(args.repeat):
+        for question, enhanced, _ in CASES:
+            started = time.perf_counter()
+            await layer.route(messages_for(question, enhanced))
+            latencies.append(time.perf_counter() - started)
+    p50, p99 = (percentile(latencies, p) * 1e6 for p in (50, 99))
+    print(f"\n{len(latencies)} routing decisions: p50 {p50:.1f} us, p99 {p99:.1f} us")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and time the rule tier of the supervisor routing")
+    parser.add_argument("--repeat", type=int, default=1000, help="Times the case set is routed for the latency figures")
+    parser.add_argument("--min-confidence", type=float, default=0.8, help="ROUTER_MIN_CONFIDENCE")
+    failures = asyncio.run(bench(parser.parse_args()))
+    if failures:
+        print(f"{failures} cases routed differently than expected", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,38 @@
+# benchmarks/bench_setup.py
+# Microbenchmark of the per-request setup cost: rebuilding the graph and ReAct agents on every
+# request (the old behaviour) versus reusing the registry compiled once at startup.
+#
+#   python benchmarks/bench_setup.py --iterations 200
+import time
+import argparse
+from fakes import install_fake_llm, setup_backend_path
+
+setup_backend_path()
+
+import workflow
+
+
+def per_request_rebuild():
+    workflow.build_agents()
+    return workflow.create_workflow()
+
+
+def measure(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure per-request graph and agent setup overhead")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    install_fake_llm(workflow, latency=0)
+    startup = workflow.init_workflow()
+    rebuild = measure(per_request_rebuild, args.iterations)
+    reuse = measure(workflow.get_workflow, args.iterations)
+    print(f"startup (once per process): {startup * 1000:9.3f} ms")
+    print(f"rebuild per request:        {rebuild * 1000:9.3f} ms")
+    print(f"reuse per request:          {reuse * 1000:9.3f} ms")
@@ -0,0 +1,97 @@
+# benchmarks/bench_workers.py
+# Load test of the multi-worker production mode: starts gunicorn with the backend config and the fake
+# LLM (stub_app.py) at each worker count, saturates POST /process and reports throughput and how
+# close it comes to linear scaling. Each worker runs at most --per-worker workflows, so with stubbed
+# LLM latency one worker's throughput is capped and added workers should add throughput almost linearly.
+#
+#   python benchmarks/bench_workers.py --workers 1 2 4 --latency 0.2 --per-worker 4
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+GUNICORN_CONF = os.path.join(os.path.dirname(BENCH_DIR), "backend", "gunicorn.conf.py")
+
+
+def start_server(workers: int, port: int, latency: float, per_worker: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(port),
+        "FAKE_LLM_LATENCY": str(latency),
+        "WORKFLOW_CONCURRENCY": str(per_worker),
+        # Every request should run the workflow, and nothing should be written to disk
+        "RESPONSE_CACHE": "off",
+        "CHECKPOINTER": "off",
+        "JOB_QUEUE": "off",
+        "KNOWLEDGE_BASE": "off",
+        "LOG_LEVEL": "WARNING",
+    }
+    command = [sys.executable, "-m", "gunicorn", "-c", GUNICORN_CONF, "--chdir", BENCH_DIR, "--log-level", "warning", "stub_app:app"]
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_ready(client: httpx.AsyncClient, workers: int, timeout: float = 60.0):
+    """Wait until /health answers from every worker process."""
+    deadline = time.monotonic() + timeout
+    seen = set()
+    while time.monotonic() < deadline:
+        try:
+            seen.add((await client.get("/health")).json()["pid"])
+        except httpx.HTTPError:
+            await asyncio.sleep(0.2)
+            continue
+        if len(seen) >= workers:
+            return
+    if not seen:
+        raise RuntimeError("The server did not start")
+
+
+async def load(client: httpx.AsyncClient, total: int, concurrency: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            response = await client.post("/process", params={"mode": "final"}, json={"text": f"What is the GDP growth rate of USA #{i}"})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def bench(args):
+    print(f"{'workers':>8} {'requests':>9} {'seconds':>9} {'req/s':>9} {'speedup':>8} {'efficiency':>11}")
+    baseline = None
+    for workers in args.workers:
+        server = start_server(workers, args.port, args.latency, args.per_worker)
+        try:
+            # Twice as many requests in flight as the workers can run, so every worker stays busy
+            concurrency = 2 * workers * args.per_worker
+            limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=None, limits=limits) as client:
+                await wait_ready(client, workers)
+                await load(client, concurrency, concurrency)  # Warm-up
+                total = args.requests_per_worker * workers
+                elapsed = await load(client, total, concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        throughput = total / elapsed
+        baseline = baseline or throughput / workers
+        speedup = throughput / baseline
+        print(f"{workers:>8} {total:>9} {elapsed:>9.2f} {throughput:>9.2f} {speedup:>8.2f} {speedup / workers:>11.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure /process throughput against the number of gunicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds of injected latency per LLM call")
+    parser.add_argument("--per-worker", type=int, default=4, help="WORKFLOW_CONCURRENCY of each worker")
+    parser.add_argument("--requests-per-worker", type=int, default=40, help="Requests sent per worker at each worker count")
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(bench(parser.parse_args()))
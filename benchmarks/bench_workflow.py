@@ -0,0 +1,200 @@
+# benchmarks/bench_workflow.py
+# Regression benchmark for whole workflow runs: a query set is answered through arun_workflow and
+# through POST /process at several concurrency levels, with the LLM and the tools replayed from
+# recorded fixtures (see replay.py), so runs are offline and comparable across commits.
+# Reports p50/p95/p99 latency, hops and LLM calls per query and throughput, and writes them as JSON.
+#
+#   python benchmarks/bench_workflow.py --record                  # once, with real API keys: record fixtures
+#   python benchmarks/bench_workflow.py --concurrency 1 4 16      # replay offline, write benchmarks/results/<commit>.json
+#   python benchmarks/bench_workflow.py --compare benchmarks/results/<older commit>.json
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from fakes import setup_backend_path
+from replay import Fixtures, RecordingChatModel, RecordingTool, ReplayChatModel, ReplayTool
+
+setup_backend_path()
+os.environ["RESPONSE_CACHE"] = "off"  # Every query should run the workflow
+
+import httpx
+import workflow
+import main
+from llm_gateway import LLMGateway
+from bench_gateway import percentile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+TARGETS = ("workflow", "http")
+
+
+class CollectingTrace(workflow.Trace):
+    """Trace that keeps the usage of every finished run, so hops and LLM calls can be reported per query."""
+
+    finished = []
+
+    def finish(self, status: str = "ok", **attributes) -> dict:
+        record = super().finish(status, **attributes)
+        CollectingTrace.finished.append({"status": status, **record.get("usage", {})})
+        return record
+
+
+def load_queries(path: str):
+    """Queries from a JSON lines file, one object per line with a ``query`` (or ``text``) field."""
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                queries.append(item.get("query") or item["text"])
+    return queries
+
+
+def install_backends(fixtures: Fixtures, record: bool, latency_scale: float):
+    """Put recording (``record``) or replaying stand-ins behind the workflow's LLM gateways and tool caches."""
+    for cached in workflow.tools:
+        cached.clear()
+        if record:
+            cached.tool = RecordingTool(cached.tool, fixtures=fixtures)
+        else:
+            cached.tool = ReplayTool(cached.tool, fixtures=fixtures, latency_scale=latency_scale)
+    if record:
+        workflow.llm = LLMGateway(primary=RecordingChatModel(model=workflow.llm.primary, fixtures=fixtures), limiter=workflow.groq_limiter)
+        workflow.decision_llm = workflow.llm
+    else:
+        workflow.llm = LLMGateway(primary=ReplayChatModel(fixtures=fixtures, latency_scale=latency_scale))
+        workflow.decision_llm = workflow.llm
+    workflow.Trace = CollectingTrace
+    workflow.init_workflow()
+
+
+async def run_level(run_one, queries, concurrency: int) -> dict:
+    gate = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+    CollectingTrace.finished.clear()
+
+    async def one(query):
+        nonlocal errors
+        async with gate:
+            started = time.perf_counter()
+            try:
+                await run_one(query)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    elapsed = time.perf_counter() - start
+    runs = CollectingTrace.finished
+    return {
+        "concurrency": concurrency,
+        "queries": len(queries),
+        "errors": errors,
+        "partial": sum(1 for run in runs if run["status"] == "partial"),
+        "seconds": round(elapsed, 4),
+        "throughput_qps": round(len(latencies) / elapsed, 4) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "hops_per_query": round(sum(run.get("hops", 0) for run in runs) / len(runs), 3) if runs else None,
+        "llm_calls_per_query": round(sum(run.get("llm_calls", 0) for run in runs) / len(runs), 3) if runs else None,
+    }
+
+
+async def bench(args, queries) -> dict:
+    results = {target: [] for target in args.targets}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+
+        async def via_http(query):
+            (await client.post("/process", params={"mode": "final"}, json={"text": query})).raise_for_status()
+
+        run_one = {"workflow": workflow.arun_workflow, "http": via_http}
+        print(f"{'target':<9} {'conc':>5} {'queries':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'hops/q':>7} {'llm/q':>7} {'q/s':>8}")
+        for target in args.targets:
+            for concurrency in args.concurrency:
+                for cached in workflow.tools:
+                    cached.clear()  # Every level starts cold, as the first one did
+                level = await run_level(run_one[target], queries, concurrency)
+                results[target].append(level)
+                print(f"{target:<9} {concurrency:>5} {level['queries']:>8} {level['errors']:>7} {level['p50_ms']:>9.1f} {level['p95_ms']:>9.1f} "
+                      f"{level['p99_ms']:>9.1f} {level['hops_per_query'] or 0:>7.2f} {level['llm_calls_per_query'] or 0:>7.2f} {level['throughput_qps']:>8.2f}")
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: dict, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nchange vs. {baseline.get('commit', baseline_path)}:")
+    for target, levels in report["results"].items():
+        before = {level["concurrency"]: level for level in baseline.get("results", {}).get(target, [])}
+        for level in levels:
+            old = before.get(level["concurrency"])
+            if old is None:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "hops_per_query", "llm_calls_per_query", "throughput_qps"):
+                if old.get(key) and level.get(key) is not None:
+                    deltas.append(f"{key} {(level[key] - old[key]) / old[key]:+.1%}")
+            print(f"{target:<9} {level['concurrency']:>5}  " + "  ".join(deltas))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a query set through the workflow and /process and report latency, hops and throughput")
+    parser.add_argument("--queries", default=os.path.join(BENCH_DIR, "fixtures", "queries.jsonl"), help="JSON lines file with a 'query' per line")
+    parser.add_argument("--fixtures", default=os.path.join(BENCH_DIR, "fixtures", "recordings.jsonl"), help="Recorded LLM and tool calls")
+    parser.add_argument("--record", action="store_true", help="Call Groq, Tavily and Riza for real and append what they answer to --fixtures")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=1, help="Times the query set is sent at each level")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier on recorded latencies; 0 measures overhead only")
+    parser.add_argument("--output", help="Where to write the JSON report (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Earlier JSON report to print relative changes against")
+    parser.add_argument("--allow-misses", action="store_true", help="Exit with success even if calls had no recording")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries) * args.repeat
+    fixtures = Fixtures(args.fixtures)
+    if not args.record and not fixtures.llm:
+        parser.error(f"no recorded LLM calls in {args.fixtures}; run once with --record and real API keys first")
+    if args.record:
+        # One pass at concurrency 1 is enough to record every call; repeats would only be cache hits
+        args.targets, args.concurrency, queries = ["workflow"], [1], load_queries(args.queries)
+    install_backends(fixtures, args.record, args.latency_scale)
+    results = asyncio.run(bench(args, queries))
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "mode": "record" if args.record else "replay",
+        "queries_file": os.path.relpath(args.queries),
+        "fixtures_file": os.path.relpath(args.fixtures),
+        "latency_scale": args.latency_scale,
+        "workflow_concurrency": main.WORKFLOW_CONCURRENCY,
+        "fixture_misses": fixtures.misses,
+        "results": results,
+    }
+    print(f"fixture misses: {fixtures.misses}")
+    output = args.output or os.path.join(BENCH_DIR, "results", f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {output}")
+    if args.compare:
+        compare(report, args.compare)
+    if not args.record and any(fixtures.misses.values()):
+        # Missed calls were answered by the fake model's canned text, so the run measured a different workflow
+        print(f"\nWARNING: {fixtures.misses} calls had no recording; the results are not comparable. "
+              f"Re-record with --record after prompt changes.", file=sys.stderr)
+        if not args.allow_misses:
+            sys.exit(1)
@@ -0,0 +1,141 @@
+# benchmarks/fakes.py
+# Offline stand-ins for the Groq LLM so the workflow can be benchmarked without API keys or network
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+def setup_backend_path():
+    """Make the backend modules importable and satisfy the API key check in workflow.py."""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    for key in ("GROQ_API_KEY", "RIZA_API_KEY", "TAVILY_API_KEY"):
+        os.environ.setdefault(key, "offline-benchmark")
+    # Per-node log lines would drown the benchmark output
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def _message_name(message):
+    if isinstance(message, dict):
+        return message.get("name")
+    return getattr(message, "name", None)
+
+
+def _message_content(message):
+    if isinstance(message, dict):
+        return message.get("content", "")
+    return getattr(message, "content", "")
+
+
+def choose_route(messages) -> str:
+    """Mimic the supervisor: enhance first, then hand the query to the coder or the researcher."""
+    names = [_message_name(m) for m in messages]
+    if "enhancer" not in names:
+        return "enhancer"
+    question = " ".join(_message_content(m) for m in messages if _message_name(m) in (None, "enhancer"))
+    if any(word in question.lower() for word in ("calculate", "compute", "sum", "+", "*")):
+        return "coder"
+    return "researcher"
+
+
+class FakeProviderError(Exception):
+    """Provider failure injected by FakeChatModel, carrying an HTTP status like the Groq client errors."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Injected provider error {status_code}")
+        self.status_code = status_code
+
+
+def _decide(tool: dict, messages) -> dict:
+    """Arguments for a forced structured-output call: the validator finishes, the supervisor routes."""
+    properties = tool["function"]["parameters"]["properties"]
+    if "FINISH" in properties.get("next", {}).get("enum", []):
+        args = {"next": "FINISH", "reason": "The answer addresses the question."}
+    else:
+        args = {"next": choose_route(messages), "reason": "Routing decided by the offline fake."}
+    if "confidence" in properties:
+        args["confidence"] = 0.9
+    return args
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that sleeps for `latency` seconds and returns a canned answer.
+
+    ``error_rate`` of the calls fail with ``FakeProviderError(error_status)``, and ``spike_rate`` of
+    them take ``spike_latency`` seconds instead, to exercise the LLM gateway's retries and hedging.
+    """
+
+    latency: float = 0.05
+    answer: str = "Offline answer."
+    error_rate: float = 0.0
+    error_status: int = 429
+    spike_rate: float = 0.0
+    spike_latency: float = 2.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def _delay(self) -> float:
+        self.calls += 1
+        if random.random() < self.error_rate:
+            raise FakeProviderError(self.error_status)
+        return self.spike_latency if random.random() < self.spike_rate else self.latency
+
+    def _result(self, messages, tools=None, tool_choice=None) -> ChatResult:
+        # Approximate usage so budgets and token metrics see realistic numbers
+        prompt_tokens = count_tokens_approximately(messages)
+        completion_tokens = count_tokens_approximately([AIMessage(content=self.answer)])
+        usage = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        if tools and tool_choice:
+            # Structured output forces a tool call; the ReAct agents bind tools without forcing one and get plain answers
+            tool_call = {"name": tools[0]["function"]["name"], "args": _decide(tools[0], messages), "id": f"call_{self.calls}"}
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content="", tool_calls=[tool_call], usage_metadata=usage))])
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer, usage_metadata=usage))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return self._result(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return self._result(messages, kwargs.get("tools"), kwargs.get("tool_choice"))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        if kwargs.get("tools") and kwargs.get("tool_choice"):
+            message = (await self._agenerate(messages, stop, **kwargs)).generations[0].message
+            chunks = [{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i} for i, call in enumerate(message.tool_calls)]
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=chunks, usage_metadata=message.usage_metadata))
+            return
+        # Spread the latency over the words of the answer so token streaming can be observed
+        latency = self._delay()
+        words = self.answer.split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(latency / len(words))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+
+def install_fake_llm(workflow, **kwargs) -> FakeChatModel:
+    """Put a FakeChatModel behind the workflow's LLM gateways, so retries, hedging and failover run as they would against Groq."""
+    from llm_gateway import LLMGateway
+    fake = FakeChatModel(**kwargs)
+    workflow.llm = LLMGateway(primary=fake)
+    workflow.decision_llm = workflow.llm.with_fallback(FakeChatModel(latency=fake.latency))
+    return fake
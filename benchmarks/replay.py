@@ -0,0 +1,225 @@
+# benchmarks/replay.py
+# Record-and-replay backends for the LLM and the tools, so workflow benchmarks are deterministic and offline.
+#
+# A fixtures file is JSON lines, one recorded call per line:
+#   {"kind": "llm", "key": "...", "message": {...}, "seconds": 0.8}
+#   {"kind": "tool", "name": "tavily_search_results_json", "key": "...", "output": [...], "seconds": 1.2}
+# Calls are matched on a hash of what was sent (messages and bound tools, or tool arguments), so a
+# replayed run follows the recorded one as long as the prompts have not changed. Calls without a
+# recording fall back to the deterministic FakeChatModel answer and are counted as misses.
+import json
+import time
+import hashlib
+import asyncio
+import threading
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import BaseTool, ToolException
+from fakes import FakeChatModel
+
+
+def llm_key(messages, kwargs) -> str:
+    payload = {
+        "messages": [
+            [m.type, getattr(m, "name", None), m.content, [[c["name"], c["args"]] for c in getattr(m, "tool_calls", None) or []]]
+            for m in messages
+        ],
+        "tools": sorted(tool["function"]["name"] for tool in kwargs.get("tools") or []),
+        # Providers spell a forced tool call differently; only whether one was forced matters
+        "forced": bool(kwargs.get("tool_choice")),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def tool_key(name: str, args: dict) -> str:
+    return hashlib.sha256(json.dumps([name, args], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class Fixtures:
+    """Recorded LLM and tool calls, loaded from and appended to a JSON lines file."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.llm = {}
+        self.tools = {}
+        self.misses = {"llm": 0, "tool": 0}
+        self._lock = threading.Lock()
+        if path:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            self._add(json.loads(line))
+            except FileNotFoundError:
+                pass
+
+    def _add(self, record: dict):
+        if record["kind"] == "llm":
+            self.llm[record["key"]] = record
+        else:
+            self.tools[record["key"]] = record
+
+    def record(self, record: dict):
+        with self._lock:
+            self._add(record)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+
+    def miss(self, kind: str):
+        with self._lock:
+            self.misses[kind] += 1
+
+
+class ReplayChatModel(FakeChatModel):
+    """Answers with the recorded message for the same prompt, after the recorded latency times ``latency_scale``."""
+
+    fixtures: Any = None
+    latency_scale: float = 1.0
+
+    def _recorded(self, messages, kwargs):
+        record = self.fixtures.llm.get(llm_key(messages, kwargs))
+        if record is None:
+            self.fixtures.miss("llm")
+            return None
+        self.calls += 1
+        return messages_from_dict([record["message"]])[0], record["seconds"] * self.latency_scale
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        recorded = self._recorded(messages, kwargs)
+        if recorded is None:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        message, seconds = recorded
+        await asyncio.sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        recorded = self._recorded(messages, kwargs)
+        if recorded is None:
+            return super()._generate(messages, stop, run_manager, **kwargs)
+        message, seconds = recorded
+        time.sleep(seconds)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        recorded = self._recorded(messages, kwargs)
+        if recorded is None:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+            return
+        message, seconds = recorded
+        await asyncio.sleep(seconds)
+        chunks = [{"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i} for i, c in enumerate(message.tool_calls)]
+        yield ChatGenerationChunk(message=AIMessageChunk(content=message.content, tool_call_chunks=chunks, usage_metadata=message.usage_metadata))
+
+
+class RecordingChatModel(BaseChatModel):
+    """Passes calls through to ``model`` and records each prompt with its answer and latency."""
+
+    model: BaseChatModel
+    fixtures: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording-chat-model"
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.model, "model_name", type(self.model).__name__)
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(**self.model.bind_tools(tools, **kwargs).kwargs)
+
+    def _record(self, messages, kwargs, message, started: float):
+        self.fixtures.record({"kind": "llm", "key": llm_key(messages, kwargs), "message": message_to_dict(message), "seconds": round(time.perf_counter() - started, 4)})
+
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        started = time.perf_counter()
+        result = await self.model._agenerate(messages, stop=stop, **kwargs)
+        self._record(messages, kwargs, result.generations[0].message, started)
+        return result
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        started = time.perf_counter()
+        result = self.model._generate(messages, stop=stop, **kwargs)
+        self._record(messages, kwargs, result.generations[0].message, started)
+        return result
+
+    async def _astream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any):
+        started = time.perf_counter()
+        merged = None
+        async for chunk in self.model._astream(messages, stop=stop, **kwargs):
+            merged = chunk if merged is None else merged + chunk
+            yield chunk
+        if merged is not None:
+            message = merged.message
+            self._record(messages, kwargs, AIMessage(content=message.content, tool_calls=message.tool_calls, usage_metadata=message.usage_metadata), started)
+
+
+class ReplayTool(BaseTool):
+    """Stands in for a tool, returning the recorded output for the same arguments, or raising the recorded tool error."""
+
+    fixtures: Any = None
+    latency_scale: float = 1.0
+
+    def __init__(self, tool: BaseTool, **kwargs):
+        super().__init__(name=tool.name, description=tool.description, args_schema=tool.args_schema, **kwargs)
+
+    def _recorded(self, kwargs):
+        record = self.fixtures.tools.get(tool_key(self.name, kwargs))
+        if record is None:
+            self.fixtures.miss("tool")
+            return f"No recorded {self.name} output for these arguments.", False, 0.0
+        return record["output"], record.get("error", False), record["seconds"] * self.latency_scale
+
+    def _run(self, **kwargs):
+        output, error, seconds = self._recorded(kwargs)
+        time.sleep(seconds)
+        if error:
+            raise ToolException(output)
+        return output
+
+    async def _arun(self, **kwargs):
+        output, error, seconds = self._recorded(kwargs)
+        await asyncio.sleep(seconds)
+        if error:
+            raise ToolException(output)
+        return output
+
+
+class RecordingTool(BaseTool):
+    """Passes calls through to ``tool`` and records each output, or tool error, with its latency."""
+
+    tool: BaseTool
+    fixtures: Any = None
+
+    def __init__(self, tool: BaseTool, **kwargs):
+        super().__init__(tool=tool, name=tool.name, description=tool.description, args_schema=tool.args_schema, **kwargs)
+
+    def _record(self, kwargs, output, started: float, error: bool = False):
+        self.fixtures.record({
+            "kind": "tool", "name": self.name, "key": tool_key(self.name, kwargs), "output": output, "error": error,
+            "seconds": round(time.perf_counter() - started, 4),
+        })
+
+    def _run(self, **kwargs):
+        started = time.perf_counter()
+        try:
+            output = self.tool.invoke(kwargs)
+        except ToolException as e:
+            self._record(kwargs, str(e), started, error=True)
+            raise
+        self._record(kwargs, output, started)
+        return output
+
+    async def _arun(self, **kwargs):
+        started = time.perf_counter()
+        try:
+            output = await self.tool.ainvoke(kwargs)
+        except ToolException as e:
+            self._record(kwargs, str(e), started, error=True)
+            raise
+        self._record(kwargs, output, started)
+        return output
@@ -0,0 +1,14 @@
+# benchmarks/stub_app.py
+# The backend app with the fake LLM installed, for benchmarks that run it in real server processes:
+#
+#   FAKE_LLM_LATENCY=0.2 gunicorn -c ../backend/gunicorn.conf.py --chdir benchmarks stub_app:app
+import os
+from fakes import install_fake_llm, setup_backend_path
+
+setup_backend_path()
+
+import workflow
+
+install_fake_llm(workflow, latency=float(os.environ.get("FAKE_LLM_LATENCY", "0.05")))
+
+from main import app
@@ -4,16 +4,25 @@ import requests
 import json
 import base64
 from io import BytesIO
-import time
 from PIL import Image
 import base64
 import os
+import uuid
+from backend_client import BackendClient
 
-BACKEND_URL = "http://brainchain-backend:8000"
 # Updated brand colors to match the logo
 BRAND_COLOR_TEAL = "#4DDBBA"
 BRAND_COLOR_PURPLE = "#9370DB"  # Close match to the purple in the logo
 
+# Chat history limits: older exchanges are trimmed from the session, and only the latest few are
+# rendered with every agent message - earlier ones are listed page by page as question and answer
+HISTORY_MAX_EXCHANGES = int(os.environ.get("HISTORY_MAX_EXCHANGES", "50"))
+HISTORY_EXPANDED = int(os.environ.get("HISTORY_EXPANDED", "3"))
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "10"))
+
+# Agents whose message is the answer to the user's question
+ANSWER_AGENTS = ("researcher", "coder")
+
 # Agent colors from Image 2
 AGENT_COLORS = {
     "Supervisor": "#FFA500",  # Orange
@@ -49,6 +58,103 @@ def format_message(message):
         else:
             return st.write(message.get("content", ""))
 
+@st.cache_resource
+def get_backend_client():
+    """One pooled keep-alive client for the whole Streamlit server, reused across reruns and sessions."""
+    return BackendClient()
+
+@st.cache_data(ttl=60)
+def threads_enabled():
+    """Whether the backend keeps conversation threads. Without them (CHECKPOINTER=off) a thread_id is refused
+    with 400, so queries are sent without one and each is answered on its own."""
+    try:
+        return get_backend_client().threads_enabled()
+    except requests.exceptions.RequestException:
+        return False
+
+def stream_query(user_input, thread_id=None):
+    """Send the query to the streaming endpoint and render each agent message as soon as it arrives.
+
+    Queries sharing a ``thread_id`` form one conversation; the backend keeps the earlier turns.
+
+    Returns the response in the same shape as ``/process`` so it can be stored in the chat history,
+    or None if the backend reported an error.
+    """
+    messages = [{"type": "human", "content": user_input}]
+    # One live box per answering agent - the researcher and coder may stream in parallel
+    token_boxes = {}
+    try:
+        for event in get_backend_client().stream(user_input, thread_id):
+            if event["type"] == "token":
+                # Show the answering agent's text while it is still being generated
+                box = token_boxes.setdefault(event["node"], {"placeholder": st.empty(), "text": ""})
+                box["text"] += event["content"]
+                box["placeholder"].markdown(f"**{event['node'].upper()}**: {box['text']}")
+            elif event["type"] == "message":
+                box = token_boxes.pop(event["node"], None)
+                if box is not None:
+                    box["placeholder"].empty()
+                message = {"name": event["name"], "content": event["content"]}
+                messages.append(message)
+                format_message(message)
+            elif event["type"] == "partial":
+                st.warning(f"Stopped early: the {event['stopped_by']} budget ran out. Showing the best answer so far.")
+            elif event["type"] == "error":
+                st.error(f"Error: {event['detail']}")
+                return None
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 400 and thread_id is not None and not token_boxes and len(messages) == 1:
+            # The backend was restarted without conversation threads; ask again and answer without one
+            threads_enabled.clear()
+            if not threads_enabled():
+                return stream_query(user_input)
+        st.error(f"Error: {e.response.status_code} - {e.response.text}")
+        return None
+    return {"messages": messages}
+
+def final_answer(response):
+    """Latest researcher or coder message of a response, falling back to the last message."""
+    messages = response.get("messages", [])
+    for message in reversed(messages):
+        if (message.get("name") or "").lower() in ANSWER_AGENTS:
+            return message.get("content", "")
+    return messages[-1].get("content", "") if len(messages) > 1 else ""
+
+def add_exchange(query, response):
+    """Append an exchange to the session history, dropping the oldest beyond HISTORY_MAX_EXCHANGES."""
+    history = st.session_state.chat_history
+    history.append({"query": query, "response": response, "answer": final_answer(response)})
+    trimmed = len(history) - HISTORY_MAX_EXCHANGES
+    if trimmed > 0:
+        del history[:trimmed]
+        st.session_state.trimmed_exchanges = st.session_state.get("trimmed_exchanges", 0) + trimmed
+
+def render_exchange(exchange):
+    st.markdown(f"""
+    <div style="background-color: #383838; padding: 10px; border-radius: 10px; margin-bottom: 10px;">
+        <p style="font-weight: bold; color: {BRAND_COLOR_TEAL};">YOU:</p>
+        <p style="margin-left: 10px; color: #E0E0E0;">{exchange.get("query", "")}</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    if "messages" in exchange.get("response", {}):
+        # Skip the first message which is the user query (already displayed)
+        for message in exchange["response"]["messages"][1:]:
+            format_message(message)
+    st.markdown('<hr style="border-color:#4F4F4F;margin:20px 0;">', unsafe_allow_html=True)
+
+def render_earlier_exchanges(earlier):
+    """Question and final answer of the exchanges before the expanded ones, one page at a time, newest page first."""
+    if not st.toggle(f"Show {len(earlier)} earlier exchanges", key="show_earlier"):
+        return
+    pages = (len(earlier) + HISTORY_PAGE_SIZE - 1) // HISTORY_PAGE_SIZE
+    page = st.number_input("Page (1 = most recent)", min_value=1, max_value=pages, value=1, key="history_page") if pages > 1 else 1
+    end = len(earlier) - (page - 1) * HISTORY_PAGE_SIZE
+    for exchange in earlier[max(0, end - HISTORY_PAGE_SIZE):end]:
+        st.markdown(f"**YOU**: {exchange.get('query', '')}")
+        st.markdown(f"**ANSWER**: {exchange.get('answer') or final_answer(exchange.get('response', {}))}")
+        st.markdown('<hr style="border-color:#4F4F4F;margin:10px 0;">', unsafe_allow_html=True)
+
 # Function to load the brain-chain logo as base64
 def get_brain_chain_logo_base64():
     # This is a placeholder - you'll need to replace with actual logo data
@@ -57,6 +163,7 @@ def get_brain_chain_logo_base64():
 
 
 # Add this function above your `main()` if not already
+@st.cache_data
 def get_base64_of_image(image_path):
     with open(image_path, "rb") as img_file:
         b64_string = base64.b64encode(img_file.read()).decode()
@@ -217,6 +324,19 @@ def main():
     if "user_input" not in st.session_state:
         st.session_state.user_input = ""
 
+    # One backend conversation thread per browser session, so follow-up questions keep their context
+    if "thread_id" not in st.session_state:
+        st.session_state.thread_id = uuid.uuid4().hex
+
+    def new_conversation():
+        try:
+            get_backend_client().delete_thread(st.session_state.thread_id)
+        except requests.exceptions.RequestException:
+            pass  # The backend evicts idle threads on its own
+        st.session_state.thread_id = uuid.uuid4().hex
+        st.session_state.chat_history = []
+        st.session_state.trimmed_exchanges = 0
+
     # Function to reset the input box
     def reset_input():
         st.session_state.user_input = ""
@@ -224,23 +344,20 @@ def main():
     # Display chat history
     if st.session_state.chat_history:
         st.subheader("Conversation History")
+        st.button("New conversation", on_click=new_conversation)
         st.markdown(f'<hr style="height:3px;border:none;background:linear-gradient(to right, {BRAND_COLOR_TEAL}, {BRAND_COLOR_PURPLE});margin-bottom:20px;">', unsafe_allow_html=True)
         
         chat_container = st.container()
         with chat_container:
-            for i, exchange in enumerate(st.session_state.chat_history):
-                st.markdown(f"""
-                <div style="background-color: #383838; padding: 10px; border-radius: 10px; margin-bottom: 10px;">
-                    <p style="font-weight: bold; color: {BRAND_COLOR_TEAL};">YOU:</p>
-                    <p style="margin-left: 10px; color: #E0E0E0;">{exchange.get("query", "")}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if "messages" in exchange.get("response", {}):
-                    # Skip the first message which is the user query (already displayed)
-                    for message in exchange["response"]["messages"][1:]:
-                        format_message(message)
-                st.markdown('<hr style="border-color:#4F4F4F;margin:20px 0;">', unsafe_allow_html=True)
+            # Rerun cost stays flat as the conversation grows: only the latest exchanges are rendered in full
+            history = st.session_state.chat_history
+            split = max(0, len(history) - HISTORY_EXPANDED)
+            if st.session_state.get("trimmed_exchanges"):
+                st.caption(f"{st.session_state.trimmed_exchanges} older exchanges were removed from this session.")
+            if split:
+                render_earlier_exchanges(history[:split])
+            for exchange in history[split:]:
+                render_exchange(exchange)
 
     # Create a card-like container for the input form with dark theme colors
     st.markdown(f"""
@@ -263,28 +380,18 @@ def main():
         if submitted and user_input:
             with st.spinner("🧠 Agents working on your query..."):
                 try:
-                    # Add a brief delay for visual effect
-                    time.sleep(0.5)
-                    
-                    response = requests.post(
-                        f"{BACKEND_URL}/process",
-                        json={"text": user_input}
-                    )
-
-                    if response.status_code == 200:
-                        result = response.json()
-                        
+                    # Agent messages are rendered by stream_query as each node finishes
+                    result = stream_query(user_input, st.session_state.thread_id if threads_enabled() else None)
+
+                    if result is not None:
                         # Add to chat history
-                        st.session_state.chat_history.append({
-                            "query": user_input,
-                            "response": result["result"]
-                        })
+                        add_exchange(user_input, result)
                         
                         # Display success and rerun to update the chat history display
                         st.success("Processing Complete ✅")
                         st.rerun()
-                    else:
-                        st.error(f"Error: {response.status_code} - {response.text}")
+                except requests.exceptions.Timeout:
+                    st.error("The backend stopped responding. Please try again.")
                 except requests.exceptions.RequestException as e:
                     st.error(f"Connection error: {e}")
 
@@ -0,0 +1,71 @@
+# frontend/backend_client.py
+import os
+import json
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+BACKEND_URL = os.environ.get("BACKEND_URL", "http://brainchain-backend:8000")
+# Seconds to open a connection, and to wait for the next bytes of a response. A streamed answer sends
+# an event whenever an agent finishes or generates tokens, so the read timeout bounds the longest silent step.
+BACKEND_CONNECT_TIMEOUT = float(os.environ.get("BACKEND_CONNECT_TIMEOUT", "5"))
+BACKEND_READ_TIMEOUT = float(os.environ.get("BACKEND_READ_TIMEOUT", "180"))
+BACKEND_RETRIES = int(os.environ.get("BACKEND_RETRIES", "3"))
+BACKEND_POOL_SIZE = int(os.environ.get("BACKEND_POOL_SIZE", "20"))
+
+
+class BackendClient:
+    """Keep-alive HTTP client for the Brain-Chain API, shared by every Streamlit session.
+
+    Connections are pooled, every request has a connect and a read timeout, and failed connections
+    and 502/503/504 responses are retried with exponential backoff (honouring ``Retry-After``).
+    A request the backend may already be working on (a read timeout or a dropped stream) is never
+    retried, so a query is not run twice.
+    """
+
+    def __init__(self, base_url: str = BACKEND_URL, connect_timeout: float = BACKEND_CONNECT_TIMEOUT,
+                 read_timeout: float = BACKEND_READ_TIMEOUT, retries: int = BACKEND_RETRIES, pool_size: int = BACKEND_POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST", "DELETE"}),
+            backoff_factor=0.5,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def stream(self, text: str, thread_id: str = None):
+        """POST the query to /process/stream and yield its events as they arrive.
+
+        Raises ``requests.HTTPError`` if the backend refuses the query, and ``requests.RequestException``
+        on connection problems or when no event arrives within the read timeout.
+        """
+        payload = {"text": text} if thread_id is None else {"text": text, "thread_id": thread_id}
+        with self.session.post(f"{self.base_url}/process/stream", json=payload, stream=True, timeout=self.timeout) as response:
+            if not response.ok:
+                response.content  # Read the error detail before the connection is released
+                response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def threads_enabled(self) -> bool:
+        """Whether the backend keeps conversation threads, i.e. it runs with a checkpointer."""
+        response = self.session.get(f"{self.base_url}/threads/stats", timeout=self.timeout)
+        response.raise_for_status()
+        return bool(response.json().get("enabled"))
+
+    def delete_thread(self, thread_id: str):
+        self.session.delete(f"{self.base_url}/threads/{thread_id}", timeout=self.timeout)
+
+    def close(self):
+        self.session.close()